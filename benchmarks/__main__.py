@@ -0,0 +1,66 @@
+"""Run the benchmark suite and compare it with the baselines"""
+
+import argparse
+import logging
+import sys
+
+from benchmarks.suite import (
+    BASELINES_PATH,
+    BENCHMARKS,
+    REGRESSION_MIN_MS,
+    REGRESSION_THRESHOLD,
+    SCENARIOS,
+    find_regressions,
+    load_baselines,
+    run_suite,
+    save_baselines,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"one of {', '.join(SCENARIOS)}, all by default"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument(
+        "--min-ms",
+        type=float,
+        default=REGRESSION_MIN_MS,
+        help="ignore slowdowns smaller than this, in milliseconds",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help=f"save results to {BASELINES_PATH.name}"
+    )
+    args = parser.parse_args()
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    if unknown := set(args.scenarios) - SCENARIOS.keys():
+        parser.error(f"unknown scenarios {', '.join(unknown)}")
+
+    logging.disable(logging.INFO)
+    results = run_suite(args.scenarios, args.repeat)
+    baselines = load_baselines()
+
+    print(f"{'benchmark':<34}" + "".join(f"{name:>12}" for name in args.scenarios))
+    for bench_name in BENCHMARKS:
+        print(
+            f"{bench_name:<34}"
+            + "".join(
+                f"{results[name][bench_name]:>10.2f}ms" for name in args.scenarios
+            )
+        )
+
+    if args.save:
+        save_baselines(results)
+        print(f"Saved baselines to {BASELINES_PATH}")
+        return 0
+
+    regressions = find_regressions(results, baselines, args.threshold, args.min_ms)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Compare the reminder scheduler with a repeating JobQueue job per person"""
+
+import logging
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from telegram.ext import Application
+
+from on_call_bot.reminders import ReminderScheduler
+
+SIZES = [1_000, 5_000, 10_000]
+STATUS_CHANGES = 500
+INTERVAL = timedelta(hours=4)
+
+
+async def remind(_):
+    pass
+
+
+def job_queue_run(size: int, changed: list[int]):
+    """The job per person that was created and looked up by name on every status change"""
+    job_queue = Application.builder().token("0:benchmark").build().job_queue
+
+    def schedule():
+        for chat_id in range(size):
+            job_queue.run_repeating(
+                remind, INTERVAL, chat_id=chat_id, name=str(chat_id)
+            )
+
+    def change_statuses():
+        for chat_id in changed:
+            job = job_queue.get_jobs_by_name(name=str(chat_id))
+            if job:
+                job[0].schedule_removal()
+            job_queue.run_repeating(
+                remind, INTERVAL, chat_id=chat_id, name=str(chat_id)
+            )
+
+    return timeit.timeit(schedule, number=1), timeit.timeit(change_statuses, number=1)
+
+
+def scheduler_run(size: int, changed: list[int]):
+    scheduler = ReminderScheduler()
+    now = datetime.now()
+
+    def schedule():
+        for chat_id in range(size):
+            scheduler.schedule(
+                chat_id, INTERVAL, first=now + INTERVAL * random.random()
+            )
+
+    def change_statuses():
+        for i, chat_id in enumerate(changed):
+            if i % 2:
+                scheduler.cancel(chat_id)
+            else:
+                scheduler.schedule(chat_id, INTERVAL)
+
+    def tick():
+        # every reminder is due once within an interval
+        return scheduler.pop_due(now + INTERVAL)
+
+    return (
+        timeit.timeit(schedule, number=1),
+        timeit.timeit(change_statuses, number=1),
+        timeit.timeit(tick, number=1),
+    )
+
+
+def run():
+    print(
+        f"{'reminders':>10} {'jobs ms':>10} {'jobs chg ms':>12} "
+        f"{'heap ms':>10} {'heap chg ms':>12} {'tick ms':>10}"
+    )
+    for size in SIZES:
+        changed = random.sample(range(size), STATUS_CHANGES)
+        jobs_schedule, jobs_change = job_queue_run(size, changed)
+        heap_schedule, heap_change, tick = scheduler_run(size, changed)
+        print(
+            f"{size:>10} {jobs_schedule * 1000:>10.2f} {jobs_change * 1000:>12.2f} "
+            f"{heap_schedule * 1000:>10.2f} {heap_change * 1000:>12.2f} "
+            f"{tick * 1000:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    run()
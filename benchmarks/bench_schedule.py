@@ -0,0 +1,61 @@
+"""Compare the shift index queries with a full scan of the tasks tab"""
+
+import logging
+import timeit
+from datetime import datetime, timedelta
+
+from benchmarks.suite import allocated_kib
+from benchmarks.synthetic import make_person_names, make_tasks_tab
+from on_call_bot.consts import DATA_ROW_IDX, DATE_IDX, MEMBERS_IDX, TIME_IDX
+from on_call_bot.schedule import ShiftIndex
+from on_call_bot.utils import extract_and_convert_to_datetime
+
+SIZES = [1_000, 5_000, 20_000, 50_000]
+REPEATS = 20
+
+
+def full_scan_now(values: list[list[str]], moment: datetime) -> list[int]:
+    """The row by row parsing that ran on every query before the index"""
+    rows = []
+    prev_date_value = None
+    for i, row in enumerate(values[DATA_ROW_IDX:]):
+        date_value = row[DATE_IDX] or prev_date_value
+        prev_date_value = date_value
+        start, end = extract_and_convert_to_datetime(date_value, row[TIME_IDX])
+        if end >= moment >= start and row[MEMBERS_IDX:]:
+            rows.append(i + 2)
+    return rows
+
+
+def run():
+    names = make_person_names(500)
+    print(
+        f"{'rows':>8} {'build ms':>10} {'build KiB':>10} {'scan ms':>10} "
+        f"{'now ms':>10} {'range ms':>10}"
+    )
+    for size in SIZES:
+        values = make_tasks_tab(size, names)
+        moment = datetime.now()
+        build = timeit.timeit(lambda: ShiftIndex("tasks", 0, values), number=1)
+        shift_index = ShiftIndex("tasks", 0, values)
+        scan = timeit.timeit(lambda: full_scan_now(values, moment), number=1)
+        now = timeit.timeit(lambda: shift_index.at(moment), number=REPEATS) / REPEATS
+        in_range = (
+            timeit.timeit(
+                lambda: shift_index.between(moment, moment + timedelta(days=1)),
+                number=REPEATS,
+            )
+            / REPEATS
+        )
+        assert [s.row for s in shift_index.at(moment)] == full_scan_now(values, moment)
+        print(
+            f"{size:>8} {build * 1000:>10.2f} "
+            f"{allocated_kib(lambda: ShiftIndex('tasks', 0, values)):>10.0f} "
+            f"{scan * 1000:>10.2f} "
+            f"{now * 1000:>10.4f} {in_range * 1000:>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    run()
@@ -0,0 +1,130 @@
+"""Compare get_tasks_from_sheet with the row by row loop it replaced"""
+
+import logging
+import timeit
+from datetime import datetime, timedelta
+
+from benchmarks.suite import SCENARIOS, allocated_kib, load_scenario
+from on_call_bot import sheet_helpers
+from on_call_bot.consts import (
+    DATA_ROW_IDX,
+    DATE_IDX,
+    HEADERS_ROW_IDX,
+    MEMBERS_IDX,
+    TASK_NAMES_IDX,
+    TIME_IDX,
+)
+from on_call_bot.globals import persons
+from on_call_bot.models import Person, Task
+from on_call_bot.utils import extract_and_convert_to_datetime, index_strings
+
+REPEATS = 5
+
+
+def loop_get_tasks(
+    tab_name: str,
+    tab_index: int,
+    tab_data: list[list[str]],
+    now: bool = True,
+    person: Person = None,
+    start_from: datetime = None,
+    end_in: datetime = None,
+) -> list[Task]:
+    """The row by row filtering that ran on every query before the shift index"""
+    tasks = []
+    task_names = tab_data[HEADERS_ROW_IDX][TASK_NAMES_IDX:]
+    start_date = start_from or datetime.now()
+    end_date = end_in or datetime.max
+    prev_date_value = None
+    for i, row in enumerate(tab_data[DATA_ROW_IDX:]):
+        date_value = row[DATE_IDX]
+        time_value = row[TIME_IDX]
+        names = row[MEMBERS_IDX:]
+        if not date_value:
+            date_value = prev_date_value
+        else:
+            prev_date_value = date_value
+
+        start_task, end_task = extract_and_convert_to_datetime(date_value, time_value)
+        is_now = now and end_task >= datetime.now() >= start_task
+        is_between_dates = not now and (
+            (end_date >= end_task >= start_date)
+            or (end_date >= start_task >= start_date)
+        )
+        is_person = (person and person.name in names) or (not person)
+
+        if is_person and (is_now or is_between_dates):
+            for task_name, task_idx in index_strings(task_names).items():
+                members = []
+                cols = []
+                for j in task_idx:
+                    if names[j] and (member_person := persons.get(names[j])):
+                        members.append(member_person)
+                        cols.append(j + 2)
+
+                task = Task(
+                    task_name=task_name,
+                    sheet=tab_name,
+                    sheet_index=tab_index,
+                    row=i + 2,
+                    cols=cols,
+                    start=start_task,
+                    end=end_task,
+                    members=members,
+                )
+                task_member_names = [p.name for p in task.members]
+                if (
+                    person and person.name not in task_member_names
+                ) or not task_member_names:
+                    continue
+                tasks.append(task)
+    return tasks
+
+
+def run():
+    now = datetime.now()
+    print(
+        f"{'scenario':>10} {'query':>8} {'loop ms':>10} {'index ms':>10} "
+        f"{'loop KiB':>10} {'index KiB':>10} {'tasks':>6}"
+    )
+    for name in SCENARIOS:
+        scenario = load_scenario(name)
+        person = persons[scenario.now_tasks[0].members[0].name]
+        queries = {
+            "now": dict(now=True),
+            "week": dict(now=False, start_from=now, end_in=now + timedelta(days=7)),
+            "person": dict(now=False, person=person, start_from=now),
+        }
+        for query_name, kwargs in queries.items():
+            tabs = [sheet_helpers.get_tab(tab) for tab in scenario.task_tabs]
+
+            def loop():
+                return [
+                    task
+                    for tab in tabs
+                    for task in loop_get_tasks(
+                        tab.title, tab.index, tab.values, **kwargs
+                    )
+                ]
+
+            def index():
+                return [
+                    task
+                    for tab in tabs
+                    for task in sheet_helpers.get_tasks_from_sheet(tab.title, **kwargs)
+                ]
+
+            tasks = index()
+            assert tasks == loop()
+            loop_ms = min(timeit.repeat(loop, number=1, repeat=REPEATS)) * 1000
+            index_ms = min(timeit.repeat(index, number=1, repeat=REPEATS)) * 1000
+            print(
+                f"{name:>10} {query_name:>8} {loop_ms:>10.2f} {index_ms:>10.2f} "
+                f"{allocated_kib(loop):>10.1f} {allocated_kib(index):>10.1f} "
+                f"{len(tasks):>6}"
+            )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    run()
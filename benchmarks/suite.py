@@ -0,0 +1,211 @@
+"""
+Benchmarks of the schedule parsing and report generation on synthetic units.
+Results are kept per scenario and benchmark in milliseconds, and are compared
+with the JSON baselines to find regressions.
+"""
+
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import cache
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.synthetic import make_spreadsheet
+from on_call_bot import schedule, sheet_helpers
+from on_call_bot.consts import DATA_ROW_IDX, DATE_IDX, TIME_IDX
+from on_call_bot.fake_sheets import FakeSpreadsheet
+from on_call_bot.globals import persons, teams
+from on_call_bot.helpers import generate_ics, generate_who_is_here_message
+from on_call_bot.models import StatusName, Task
+from on_call_bot.sheet_cache import SheetCache
+from on_call_bot.utils import extract_and_convert_to_datetime
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+# a benchmark regressed when it is slower than its baseline times the threshold,
+# and by more than the noise floor (ms), since baselines come from another machine
+REGRESSION_THRESHOLD = 1.5
+REGRESSION_MIN_MS = 5.0
+DAYS = 90
+
+# scenario name: (persons, task tabs)
+SCENARIOS = {
+    "50p-1t": (50, 1),
+    "500p-5t": (500, 5),
+    "1000p-10t": (1000, 10),
+    "5000p-50t": (5000, 50),
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    spreadsheet: FakeSpreadsheet
+    task_tabs: list[str]
+    now_tasks: list[Task] = field(default_factory=list)
+    person_tasks: list[Task] = field(default_factory=list)
+
+
+def use_spreadsheet(spreadsheet: FakeSpreadsheet):
+    """Point the sheet helpers to the spreadsheet, with empty caches"""
+    sheet_helpers.sheet_client._spreadsheet = spreadsheet
+    sheet_helpers.sheet_client.worksheets.clear()
+    sheet_helpers.storage = sheet_helpers.sheet_storage
+    sheet_helpers.sheet_cache = SheetCache()
+    schedule._shift_indexes.clear()
+    sheet_helpers.fetch_tabs(
+        [worksheet.title for worksheet in spreadsheet.worksheets()]
+    )
+
+    loaded_teams, loaded_persons = sheet_helpers.get_teams_and_persons()
+    teams.clear()
+    teams.update(loaded_teams)
+    persons.clear()
+    persons.update(loaded_persons)
+
+
+def get_tasks(scenario: Scenario, **kwargs) -> list[Task]:
+    tasks = []
+    for tab_name in scenario.task_tabs:
+        tasks.extend(sheet_helpers.get_tasks_from_sheet(tab_name, **kwargs))
+    return sorted(tasks, key=lambda t: t.start)
+
+
+@cache
+def build_scenario(name: str) -> Scenario:
+    persons_count, tabs = SCENARIOS[name]
+    spreadsheet = make_spreadsheet(persons_count, tabs, DAYS)
+    task_tabs = [
+        ws.title for ws in spreadsheet.worksheets() if ws.title.startswith("tasks")
+    ]
+    return Scenario(name=name, spreadsheet=spreadsheet, task_tabs=task_tabs)
+
+
+def load_scenario(name: str) -> Scenario:
+    scenario = build_scenario(name)
+    use_spreadsheet(scenario.spreadsheet)
+    scenario.now_tasks = get_tasks(scenario, now=True)
+    person = persons[scenario.now_tasks[0].members[0].name]
+    scenario.person_tasks = get_tasks(
+        scenario, now=False, person=person, start_from=datetime.now()
+    )
+    return scenario
+
+
+def bench_extract_and_convert_to_datetime(scenario: Scenario):
+    values = scenario.spreadsheet.worksheet(scenario.task_tabs[0]).values
+    prev_date_value = None
+    for row in values[DATA_ROW_IDX:]:
+        date_value = row[DATE_IDX] or prev_date_value
+        prev_date_value = date_value
+        extract_and_convert_to_datetime(date_value, row[TIME_IDX])
+
+
+def bench_parse_schedule(scenario: Scenario):
+    for tab_name in scenario.task_tabs:
+        tab = sheet_helpers.get_tab(tab_name)
+        schedule.ShiftIndex(tab.title, tab.index, tab.values, tab.version)
+
+
+def bench_get_tasks_from_sheet(scenario: Scenario):
+    now = datetime.now()
+    get_tasks(scenario, now=False, start_from=now, end_in=now + timedelta(days=7))
+
+
+def bench_get_teams_and_persons(scenario: Scenario):
+    sheet_helpers.get_teams_and_persons()
+
+
+def bench_generate_who_is_here_message(scenario: Scenario):
+    released_members = sheet_helpers.get_released_members()
+    not_here = [
+        person
+        for person in persons.values()
+        if person.status.status_name in [StatusName.out, StatusName.short_out]
+        and person.description not in released_members
+    ]
+    here = [
+        person.description
+        for person in persons.values()
+        if person.status.status_name == StatusName.here
+    ]
+    generate_who_is_here_message(
+        scenario.now_tasks, here, not_here, released_members, teams
+    )
+
+
+def bench_generate_ics(scenario: Scenario):
+    generate_ics(scenario.person_tasks)
+
+
+BENCHMARKS: dict[str, Callable[[Scenario], None]] = {
+    "extract_and_convert_to_datetime": bench_extract_and_convert_to_datetime,
+    "parse_schedule": bench_parse_schedule,
+    "get_tasks_from_sheet": bench_get_tasks_from_sheet,
+    "get_teams_and_persons": bench_get_teams_and_persons,
+    "generate_who_is_here_message": bench_generate_who_is_here_message,
+    "generate_ics": bench_generate_ics,
+}
+
+
+def measure(func: Callable[[], None], repeat: int) -> float:
+    """Best run time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def allocated_kib(func: Callable[[], object]) -> float:
+    """Peak memory allocated while running the function"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_suite(scenarios: list[str], repeat: int = 5) -> dict[str, dict[str, float]]:
+    results = {}
+    for name in scenarios:
+        scenario = load_scenario(name)
+        results[name] = {
+            bench_name: round(measure(lambda: bench(scenario), repeat), 3)
+            for bench_name, bench in BENCHMARKS.items()
+        }
+    return results
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> dict[str, dict[str, float]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baselines(results: dict[str, dict[str, float]], path: Path = BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines.update(results)
+    path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baselines: dict[str, dict[str, float]],
+    threshold: float = REGRESSION_THRESHOLD,
+    min_ms: float = REGRESSION_MIN_MS,
+) -> list[str]:
+    regressions = []
+    for scenario, timings in results.items():
+        for bench_name, ms in timings.items():
+            baseline = baselines.get(scenario, {}).get(bench_name)
+            if baseline and ms > baseline * threshold and ms - baseline > min_ms:
+                regressions.append(
+                    f"{bench_name}[{scenario}]: {ms:.2f}ms, baseline {baseline:.2f}ms"
+                )
+    return regressions
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+from on_call_bot.configuration import (
+    PERSONS_SHEET_NAME,
+    RELEASES_SHEET_NAME,
+    TEAMS_SHEET_NAME,
+)
+from on_call_bot.fake_sheets import FakeSpreadsheet
+from on_call_bot.models import StatusName
+
+SHIFT_TIMES = ["07:00-15:00", "15:00-23:00", "23:00-07:00"]
+
+
+def make_person_names(count: int) -> list[str]:
+    return [f"Person {i}" for i in range(count)]
+
+
+def make_tasks_tab(
+    rows: int,
+    names: list[str],
+    positions: int = 4,
+    start_date: datetime = None,
+) -> list[list[str]]:
+    """
+    Generate tasks tab values in the sheet format: date, time range and
+    member name per position. Only the first shift of a day has a date value.
+    """
+    start_date = start_date or datetime.now() - timedelta(days=rows // 6)
+    headers = ["date", "time"] + [
+        f"Position {p % (positions // 2 + 1)}" for p in range(positions)
+    ]
+    values = [headers]
+    for i in range(rows):
+        day, shift = divmod(i, len(SHIFT_TIMES))
+        date_value = (
+            (start_date + timedelta(days=day)).strftime("%d.%m.%y") if not shift else ""
+        )
+        members = [names[(i * positions + p) % len(names)] for p in range(positions)]
+        values.append([date_value, SHIFT_TIMES[shift]] + members)
+    return values
+
+
+def make_teams_tab(names: list[str], teams: int) -> list[list[str]]:
+    """Teams tab with a column of members per team"""
+    columns = [names[t::teams] for t in range(teams)]
+    rows = max(len(column) for column in columns)
+    values = [[f"Team {t}" for t in range(teams)]]
+    for i in range(rows):
+        values.append([column[i] if i < len(column) else "" for column in columns])
+    return values
+
+
+def make_persons_tab(names: list[str]) -> list[list[str]]:
+    """Persons tab where every fifth person is out of the area"""
+    status_time = datetime.now().isoformat()
+    values = [["name", "phone", "rank", "address", "email", "status", "time", "chat"]]
+    for i, name in enumerate(names):
+        status = StatusName.out if i % 5 == 0 else StatusName.here
+        values.append(
+            [name, f"05{i:08}", "", "", "", status.value, status_time, str(1000 + i)]
+        )
+    return values
+
+
+def make_releases_tab(names: list[str], days: int) -> list[list[str]]:
+    """Releases tab that releases a few persons every day"""
+    start_date = datetime.now() - timedelta(days=days // 2)
+    values = [["date", "time", "released", "released", "released"]]
+    for day in range(days):
+        date_value = (start_date + timedelta(days=day)).strftime("%d.%m.%y")
+        released = [names[(day * 3 + r) % len(names)] for r in range(3)]
+        values.append([date_value, "00:00-23:59"] + released)
+    return values
+
+
+def make_spreadsheet(persons: int, tabs: int, days: int = 90) -> FakeSpreadsheet:
+    """
+    Spreadsheet of a unit with the given number of persons and task tabs,
+    each task tab covers `days` days around today.
+    """
+    names = make_person_names(persons)
+    sheet_tabs = {
+        PERSONS_SHEET_NAME: make_persons_tab(names),
+        TEAMS_SHEET_NAME: make_teams_tab(names, max(1, persons // 25)),
+        RELEASES_SHEET_NAME: make_releases_tab(names, days),
+    }
+    rows = days * len(SHIFT_TIMES)
+    for t in range(tabs):
+        tab_names = names[t::tabs] or names
+        sheet_tabs[f"tasks {t}"] = make_tasks_tab(rows, tab_names)
+    return FakeSpreadsheet(sheet_tabs)
@@ -0,0 +1,23 @@
+"""pytest-benchmark entry point of the suite: `python -m pytest benchmarks`"""
+
+import logging
+
+import pytest
+
+from benchmarks.suite import BENCHMARKS, SCENARIOS, load_scenario
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(autouse=True)
+def no_info_logs():
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.mark.parametrize("scenario_name", list(SCENARIOS))
+@pytest.mark.parametrize("bench_name", list(BENCHMARKS))
+def test_benchmark(benchmark, scenario_name, bench_name):
+    scenario = load_scenario(scenario_name)
+    benchmark(BENCHMARKS[bench_name], scenario)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from telegram import Update
@@ -7,27 +8,79 @@ from telegram.ext import (
     CommandHandler,
     ConversationHandler,
     MessageHandler,
+    PicklePersistence,
     filters,
 )
 
-from on_call_bot.configuration import TOKEN
+from on_call_bot.configuration import (
+    PERSISTENCE_PATH,
+    REMINDER_TICK_SECS,
+    SHEET_WRITE_FLUSH_MS,
+    STORAGE_BACKEND,
+    SYNC_INTERVAL_SECS,
+    TOKEN,
+)
 from on_call_bot.consts import TIME_RANGE_REGEX
 from on_call_bot.core import (
     button,
     done,
+    flush_sheet_writes,
     global_init,
     identify_name,
+    refresh_released,
+    restore_reminders,
+    send_due_reminders,
     start,
+    sync_sheet_storage,
     time_range_handler,
 )
+from on_call_bot.instrumentation import process_metrics
+from on_call_bot.outbox import outbox
+from on_call_bot.reminders import REMINDERS_KEY, reminders
+from on_call_bot.sheet_helpers import sheet_client
+from on_call_bot.sheet_io import sheet_executor
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 
 
+async def stop(application: Application):
+    # the bot can still send, messages left in the outbox stay in its journal
+    await outbox.stop()
+    # written by the persistence on shutdown
+    application.bot_data[REMINDERS_KEY] = reminders.snapshot()
+
+
+async def shutdown(application: Application):
+    await flush_sheet_writes(application)
+    if STORAGE_BACKEND == "sqlite":
+        await sync_sheet_storage(application)
+    sheet_client.close()
+    logging.info(f"Sheet quota: {sheet_client.quota.stats()}")
+    logging.info(f"Since start: {process_metrics.summary()}")
+
+
 def start_bot():
-    application = Application.builder().token(TOKEN).build()
+    # load the sheet while the telegram bot is initializing
+    warm_up = sheet_executor.submit(global_init)
+
+    async def wait_for_warm_up(application: Application):
+        outbox.start(application.bot)
+        await asyncio.wrap_future(warm_up)
+        restore_reminders(application.bot_data.get(REMINDERS_KEY, {}))
+        application.job_queue.run_once(refresh_released, when=0)
+
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(True)
+        .persistence(PicklePersistence(filepath=PERSISTENCE_PATH))
+        .post_init(wait_for_warm_up)
+        .post_stop(stop)
+        .post_shutdown(shutdown)
+        .build()
+    )
     conv_handler = ConversationHandler(
         entry_points=[
             CommandHandler("start", start),
@@ -39,12 +92,21 @@ def start_bot():
             ]
         },
         allow_reentry=True,
+        name="conversation",
+        persistent=True,
         fallbacks=[MessageHandler(filters.Regex("^Done$"), done)],
     )
 
     application.add_handler(conv_handler)
     application.add_handler(CallbackQueryHandler(button))
-    global_init()
+    application.job_queue.run_repeating(send_due_reminders, interval=REMINDER_TICK_SECS)
+    application.job_queue.run_repeating(
+        flush_sheet_writes, interval=SHEET_WRITE_FLUSH_MS / 1000
+    )
+    if STORAGE_BACKEND == "sqlite":
+        application.job_queue.run_repeating(
+            sync_sheet_storage, interval=SYNC_INTERVAL_SECS
+        )
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
@@ -15,6 +15,42 @@ RELEASES_SHEET_NAME = getenv("RELEASES_SHEET_NAME", "releases")  # sheet that pr
 PERSONS_SHEET_NAME = getenv("PERSONS_SHEET_NAME", "persons")  # sheet that present list ofp persons
 TEAMS_SHEET_NAME = getenv("TEAMS_SHEET_NAME", "teams")  # sheet that team division
 
+# Seconds to keep sheet tabs snapshot in memory before fetching them again
+SHEET_CACHE_TTL_SECS = int(getenv("SHEET_CACHE_TTL_SECS", 60))
+
+# Milliseconds between flushes of queued person status / chat id writes to the sheet
+SHEET_WRITE_FLUSH_MS = int(getenv("SHEET_WRITE_FLUSH_MS", 2000))
+# Local file that keeps queued sheet writes until they are flushed
+SHEET_WRITE_JOURNAL = getenv("SHEET_WRITE_JOURNAL", "sheet_writes.journal")
+
+# Threads that run blocking sheet calls, max queued + running sheet calls and seconds to wait for each call
+SHEET_IO_WORKERS = int(getenv("SHEET_IO_WORKERS", 4))
+SHEET_MAX_IN_FLIGHT = int(getenv("SHEET_MAX_IN_FLIGHT", 32))
+SHEET_CALL_TIMEOUT_SECS = int(getenv("SHEET_CALL_TIMEOUT_SECS", 30))
+
+# Where the bot reads and writes sheet data: "sheets" (directly) or "sqlite" (local copy synced with the sheet)
+STORAGE_BACKEND = getenv("STORAGE_BACKEND", "sheets")
+SQLITE_PATH = getenv("SQLITE_PATH", "on_call_bot.sqlite3")  # path to local sqlite store
+SYNC_INTERVAL_SECS = int(getenv("SYNC_INTERVAL_SECS", 60))  # seconds between local store and sheet syncs
+
+# Hot path debug logs (e.g. parsed rows) are written once every LOG_SAMPLE_EVERY occurrences
+LOG_SAMPLE_EVERY = int(getenv("LOG_SAMPLE_EVERY", 1000))
+
+# Distinct date and time range values kept parsed in memory
+DATE_PARSE_CACHE_SIZE = int(getenv("DATE_PARSE_CACHE_SIZE", 4096))
+
+# Seconds to keep the worksheets metadata (names, indexes and ids) before loading it again
+WORKSHEETS_REFRESH_SECS = int(getenv("WORKSHEETS_REFRESH_SECS", 600))
+
+# Google sheets API quota: read and write requests per minute, and share of it kept for user requests
+SHEET_READS_PER_MINUTE = int(getenv("SHEET_READS_PER_MINUTE", 60))
+SHEET_WRITES_PER_MINUTE = int(getenv("SHEET_WRITES_PER_MINUTE", 60))
+SHEET_INTERACTIVE_RESERVE = float(getenv("SHEET_INTERACTIVE_RESERVE", 0.2))
+# Retries of sheet calls that failed on quota (429) or server errors, with exponential backoff (seconds)
+SHEET_MAX_RETRIES = int(getenv("SHEET_MAX_RETRIES", 5))
+SHEET_BACKOFF_BASE_SECS = float(getenv("SHEET_BACKOFF_BASE_SECS", 1))
+SHEET_BACKOFF_MAX_SECS = float(getenv("SHEET_BACKOFF_MAX_SECS", 32))
+
 # LIST of sheet names that present tasks shifts (seperated by comma)
 TASKS_SHEET_NAMES = getenv("TASKS_SHEET_NAMES", "tasks").split(",")
 
@@ -33,6 +69,21 @@ MAX_SHORT_OUT = int(getenv("MAX_SHORT_OUT", 5))
 # Auto remind iteration (hours)
 REMIND_SHORT_OUT_HRS = int(getenv("REMIND_SHORT_HRS", 2))
 REMIND_LONG_OUT_HRS = int(getenv("REMIND_LONG_OUT_HRS", 4))
+# Seconds between checks for due reminders, all reminders due by a check are sent together
+REMINDER_TICK_SECS = int(getenv("REMINDER_TICK_SECS", 30))
+# Local file that keeps the conversations, per chat data and reminders across restarts
+PERSISTENCE_PATH = getenv("PERSISTENCE_PATH", "on_call_bot.pickle")
+
+# Telegram messages per second the bot sends in total, and seconds between messages to the same chat
+FANOUT_MESSAGES_PER_SEC = int(getenv("FANOUT_MESSAGES_PER_SEC", 25))
+FANOUT_CHAT_INTERVAL_SECS = float(getenv("FANOUT_CHAT_INTERVAL_SECS", 1))
+# Retries of a telegram message that failed on a network error or flood control
+FANOUT_MAX_RETRIES = int(getenv("FANOUT_MAX_RETRIES", 3))
+# Local file that keeps queued outgoing messages until they are sent, and workers that send them
+OUTBOX_JOURNAL = getenv("OUTBOX_JOURNAL", "outbox.journal")
+OUTBOX_WORKERS = int(getenv("OUTBOX_WORKERS", 4))
+# Seconds to wait before sending again a queued message that could not be sent
+OUTBOX_RETRY_SECS = int(getenv("OUTBOX_RETRY_SECS", 10))
 
 # Main channel to send updates
 MAIN_CHANNEL_ID = getenv("MAIN_CHANNEL_ID", "main_channel_id")
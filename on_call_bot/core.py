@@ -3,10 +3,9 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 from io import BytesIO
 
-from ics import Calendar, Event
 from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
-from telegram.ext import CallbackContext, ContextTypes, ConversationHandler, JobQueue
+from telegram.ext import CallbackContext, ContextTypes, ConversationHandler
 
 from on_call_bot import translator
 from on_call_bot.configuration import (
@@ -18,21 +17,36 @@ from on_call_bot.configuration import (
     MIN_IN,
     REMIND_LONG_OUT_HRS,
     REMIND_SHORT_OUT_HRS,
+    SHEET_CACHE_TTL_SECS,
+)
+from on_call_bot.fanout import Delivery, fanout
+from on_call_bot.globals import persons, persons_by_chat_id, released_names, teams
+from on_call_bot.helpers import generate_ics, generate_who_is_here_message, get_tasks
+from on_call_bot.models import Person, Status, StatusName, Task
+from on_call_bot.outbox import MessagePriority, outbox
+from on_call_bot.quota import background
+from on_call_bot.reminders import REMINDERS_KEY, reminders
+from on_call_bot.request_context import (
+    invalidate,
+    memoize,
+    memoize_async,
+    request_scoped,
 )
-from on_call_bot.globals import persons, persons_by_chat_id, teams
-from on_call_bot.helpers import generate_who_is_here_message, get_tasks
-from on_call_bot.models import Person, Status, StatusName
 from on_call_bot.sheet_helpers import (
+    flush_persons_writes,
     get_released_members,
+    get_releases_timeline,
     get_replacers,
     get_task_by_cell,
     get_teams_and_persons,
     switch_shifts_sheet,
+    sync_storage_with_sheet,
     update_person_chat_id_sheet,
     update_person_sheet_status,
+    warm_up_sheet,
 )
+from on_call_bot.sheet_io import run_sheet_call
 from on_call_bot.utils import (
-    convert_to_gmt2,
     convert_to_markdown,
     create_google_calendar_link,
     extract_and_convert_to_datetime_range,
@@ -60,6 +74,7 @@ async def identify_name(update: Update, _: ContextTypes.DEFAULT_TYPE):
     return 0
 
 
+@request_scoped
 async def time_range_handler(update: Update, _: ContextTypes.DEFAULT_TYPE):
     """Get time range to shoe shifts"""
     chat_id = update.effective_chat.id
@@ -70,7 +85,7 @@ async def time_range_handler(update: Update, _: ContextTypes.DEFAULT_TYPE):
 
     else:
         start_from, end_in = extract_and_convert_to_datetime_range(datetime_range_value)
-        tasks = get_tasks(start_from=start_from, end_in=end_in)
+        tasks = await run_sheet_call(get_tasks, start_from=start_from, end_in=end_in)
         tasks_by_times = defaultdict(list)
         for task in tasks:
             tasks_by_times[
@@ -203,22 +218,66 @@ async def start(update: Update, _: CallbackContext):
 
 
 def get_released() -> list[str]:
-    released_names = get_released_members()
-    not_here_persons = [persons[name] for name in released_names if name]
-    return [person.description for person in not_here_persons]
+    def released_descriptions():
+        not_here_persons = [persons[name] for name in released_names if name]
+        return [person.description for person in not_here_persons]
+
+    return memoize("released", released_descriptions)
+
+
+def get_here() -> list[Person]:
+    """Persons in the area that are not released"""
+
+    def here_persons():
+        released_members = get_released()
+        return [
+            person
+            for person in persons.values()
+            if person.status.status_name == StatusName.here
+            and f"{person.name} {person.phone}" not in released_members
+        ]
+
+    return memoize("here", here_persons)
+
+
+async def get_current_tasks(person: Person = None) -> list[Task]:
+    return await memoize_async(
+        ("current_tasks", person.name if person else None),
+        lambda: run_sheet_call(get_tasks, now=True, person=person),
+    )
+
+
+@background
+async def refresh_released(context: CallbackContext):
+    """Refresh released members and schedule the next refresh at the next window boundary"""
+    now = datetime.now()
+    next_refresh = now + timedelta(seconds=SHEET_CACHE_TTL_SECS)
+    try:
+        timeline = await run_sheet_call(get_releases_timeline)
+        released_names[:] = timeline.released_at(now)
+        next_boundary = timeline.next_boundary(now)
+        if next_boundary and next_boundary < next_refresh:
+            next_refresh = next_boundary
+    except Exception as e:
+        logging.exception(f"Failed to refresh released members due to {str(e)}")
+
+    context.job_queue.run_once(
+        refresh_released,
+        when=(next_refresh - now).total_seconds() + 1,
+        name="refresh_released",
+    )
 
 
 async def show_who_is_here(query: CallbackQuery, context: CallbackContext):
-    loaded_teams, loaded_persons = get_teams_and_persons()
+    loaded_teams, loaded_persons = await run_sheet_call(get_teams_and_persons)
     teams.update(loaded_teams)
-    while persons:
-        persons.popitem()
+    for name in persons.keys() - loaded_persons.keys():
+        logging.warning(f"{name} removed")
+        del persons[name]
 
     persons.update(loaded_persons)
-    for person in persons:
-        if person not in loaded_persons:
-            logging.warning(f"{person.name} removed")
-    tasks = get_tasks(now=True)
+    invalidate("released", "here")
+    tasks = await get_current_tasks()
     released_members = get_released()
     not_here = [
         person
@@ -274,7 +333,9 @@ async def show_shifts(
 ):
     person = persons_by_chat_id.get(chat_id)
     start_from_date = datetime.now()
-    tasks = get_tasks(now=now, person=person, start_from=start_from_date)
+    tasks = await run_sheet_call(
+        get_tasks, now=now, person=person, start_from=start_from_date
+    )
     if not tasks:
         msg = translator.get("No tasks")
     else:
@@ -339,12 +400,7 @@ async def handle_status_change(
             reply_markup=return_menu_markup,
         )
     released_members = get_released()
-    here = [
-        person
-        for person in persons.values()
-        if person.status.status_name == StatusName.here
-        and f"{person.name} {person.phone}" not in released_members
-    ]
+    here = get_here()
     if len(here) <= MIN_IN:
         await notify(
             translator.get(
@@ -354,28 +410,12 @@ async def handle_status_change(
             list(persons.keys()),
         )
 
-    job = context.job_queue.get_jobs_by_name(name=str(chat_id))
-    if job:
-        job[0].schedule_removal()
-
-    async def callback_auto_remind_message(context: CallbackContext):
-        await remind_person_status(chat_id, context, by_who="System")
+    if remind_hrs := remind_interval_hrs(status_name):
+        reminders.schedule(chat_id, timedelta(hours=remind_hrs))
+    else:
+        reminders.cancel(chat_id)
 
     if status_name in [StatusName.out, StatusName.short_out]:
-        if status_name == StatusName.out:
-            context.job_queue.run_repeating(
-                callback_auto_remind_message,
-                timedelta(hours=REMIND_LONG_OUT_HRS),
-                chat_id=chat_id,
-                name=str(chat_id),
-            )
-        elif status_name == StatusName.short_out:
-            context.job_queue.run_repeating(
-                callback_auto_remind_message,
-                timedelta(hours=REMIND_SHORT_OUT_HRS),
-                chat_id=chat_id,
-                name=str(chat_id),
-            )
         not_here = [
             person
             for person in persons.values()
@@ -387,15 +427,44 @@ async def handle_status_change(
         )
         if (len(not_here) + 1) % 5 == 0:
             notification_msg = notification_msg % (len(not_here), len(released_members))
-            await notify_commanders(notification_msg, context)
+            notify_commanders(notification_msg)
 
 
 async def remind_status(chat_id: int, context: CallbackContext, by_who="System"):
     await remind_person_status(chat_id, context, by_who)
 
 
-async def remind_person_status(chat_id: int, context: CallbackContext, by_who: str):
-    person = persons_by_chat_id[chat_id]
+def remind_interval_hrs(status_name: StatusName) -> int | None:
+    if status_name == StatusName.out:
+        return REMIND_LONG_OUT_HRS
+    if status_name == StatusName.short_out:
+        return REMIND_SHORT_OUT_HRS
+    return None
+
+
+def restore_reminders(saved: dict[int, tuple[datetime, timedelta]]):
+    """
+    Restore the reminders of the persons who are out by the loaded persons tab.
+    Saved reminders keep their due time, the others are due by the status update time.
+    """
+    restored = {}
+    for person in persons_by_chat_id.values():
+        if not (remind_hrs := remind_interval_hrs(person.status.status_name)):
+            continue
+
+        interval = timedelta(hours=remind_hrs)
+        due, saved_interval = saved.get(person.chat_id, (None, None))
+        if saved_interval != interval:
+            due = next_interval_time(person.status.update_time, remind_hrs)
+        restored[person.chat_id] = (due, interval)
+
+    reminders.restore(restored)
+    logging.info(
+        f"Restored {len(reminders)} reminders, {len(restored.keys() & saved.keys())} saved"
+    )
+
+
+def reminder_message(person: Person) -> tuple[str, InlineKeyboardMarkup]:
     msg = translator.get(
         "Remind status",
         "Your status is %s since %s.\n Please update if anything changed",
@@ -409,21 +478,33 @@ async def remind_person_status(chat_id: int, context: CallbackContext, by_who: s
         [InlineKeyboardButton(translator.get("Back report"), callback_data="back")],
         [return_button],
     ]
-    await context.bot.send_message(
-        chat_id=int(chat_id),
-        text=msg,
-        reply_markup=InlineKeyboardMarkup(inline_keyboard),
-    )
-    await notify_channel(
+    return msg, InlineKeyboardMarkup(inline_keyboard)
+
+
+async def remind_person_status(chat_id: int, context: CallbackContext, by_who: str):
+    person = persons_by_chat_id[chat_id]
+    msg, reply_markup = reminder_message(person)
+    outbox.put(int(chat_id), msg, MessagePriority.reply, reply_markup=reply_markup)
+    notify_channel(
         channel_id=DEV_CHANNEL_ID,
         message=f"{by_who} remind {person.name} about {person.status.status_name.value}",
-        context=context,
     )
 
 
-async def notify_channel(channel_id: str, message: str, context: CallbackContext):
-    if channel_id:
-        await context.bot.send_message(chat_id=channel_id, text=message)
+def notify_channel(channel_id: str, message: str):
+    """Queue a log message to the channel, behind the messages to users"""
+    outbox.put(channel_id, message, MessagePriority.log)
+
+
+def chat_ids_of(names: list[str]) -> list[int]:
+    chat_ids = []
+    for name in names:
+        person = persons.get(name)
+        if not person:
+            logging.warning(f"{name} does not found in list")
+        elif person.chat_id:
+            chat_ids.append(person.chat_id)
+    return chat_ids
 
 
 async def notify(
@@ -431,55 +512,41 @@ async def notify(
     context: CallbackContext,
     names_to_notify: list[str],
     keyboard_keys: list[list[InlineKeyboardButton]] | None = None,
-):
+) -> list[Delivery]:
     keyboard = keyboard_keys or []
     keyboard.append([return_button])
     reply_markup = InlineKeyboardMarkup(keyboard)
-    for name in names_to_notify:
-        logging.info("notifying %s", name)
-        person = persons[name]
-        if person.chat_id:
-            try:
-                await context.bot.send_message(
-                    chat_id=person.chat_id, text=message, reply_markup=reply_markup
-                )
-            except Exception as e:
-                logging.exception(
-                    f"Failed to notify {message} to {person.name} due to {str(e)}"
-                )
+    chat_ids = chat_ids_of(names_to_notify)
+    logging.info(f"notifying {len(chat_ids)} of {len(names_to_notify)} persons")
+    return await fanout.send(context.bot, chat_ids, message, reply_markup=reply_markup)
 
 
-async def notify_commanders(message, context):
-    await notify(
-        message,
-        context,
-        COMMANDERS,
+def notify_commanders(message: str):
+    """Queue an alert to the commanders, ahead of the channel logs"""
+    reply_markup = InlineKeyboardMarkup(
         [
             [
                 InlineKeyboardButton(
                     translator.get("Who is here"), callback_data="who_is_here"
                 )
-            ]
-        ],
+            ],
+            [return_button],
+        ]
     )
+    for chat_id in chat_ids_of(COMMANDERS):
+        outbox.put(chat_id, message, MessagePriority.alert, reply_markup=reply_markup)
 
 
 async def check_outs(query: CallbackQuery, chat_id: int):
     request_person = persons_by_chat_id[chat_id]
-    if get_tasks(now=True, person=request_person):
+    if await get_current_tasks(request_person):
         msg = translator.get(
             "Person in task", "You are in task and need to change to make an exit"
         )
         await query.edit_message_text(text=msg, reply_markup=return_menu_markup)
         return False
 
-    released_members = get_released()
-    here = [
-        person
-        for person in persons.values()
-        if person.status.status_name == StatusName.here
-        and f"{person.name} {person.phone}" not in released_members
-    ]
+    here = get_here()
     if len(here) <= MIN_IN:
         msg = translator.get("Out is full")
         inline_keyboard = [
@@ -601,10 +668,14 @@ async def switch_shifts(
 ):
     requester_person = persons_by_chat_id[requester_chat_id]
     requested_person = persons_by_chat_id[requested_chat_id]
-    msg = switch_shifts_sheet(
-        requester_person, first_shift_data, requested_person, second_shift_data
+    msg = await run_sheet_call(
+        switch_shifts_sheet,
+        requester_person,
+        first_shift_data,
+        requested_person,
+        second_shift_data,
     )
-    await notify_channel(channel_id=DEV_CHANNEL_ID, message=msg, context=context)
+    notify_channel(channel_id=DEV_CHANNEL_ID, message=msg)
 
 
 async def handle_change(
@@ -624,9 +695,10 @@ async def handle_change(
             requested_shift,
             context,
         )
-        await context.bot.send_message(
-            chat_id=requester_chat_id,
-            text=translator.get("Change succeeded"),
+        outbox.put(
+            requester_chat_id,
+            translator.get("Change succeeded"),
+            MessagePriority.reply,
             reply_markup=return_menu_markup,
         )
 
@@ -634,9 +706,10 @@ async def handle_change(
             text=translator.get("Change succeeded"), reply_markup=return_menu_markup
         )
     else:
-        await context.bot.send_message(
-            chat_id=requester_chat_id,
-            text=translator.get("Change rejected"),
+        outbox.put(
+            requester_chat_id,
+            translator.get("Change rejected"),
+            MessagePriority.reply,
             reply_markup=return_menu_markup,
         )
         await query.edit_message_text(
@@ -644,38 +717,12 @@ async def handle_change(
         )
 
 
-def init_job_queue(job_queue: JobQueue, person: Person):
-    job = job_queue.get_jobs_by_name(name=str(person.chat_id))
-    if job:
-        job[0].schedule_removal()
-
-    async def callback_auto_remind_message(context: CallbackContext):
-        await remind_person_status(person.chat_id, context, by_who="System")
-
-    if person.status.status_name == StatusName.out:
-        job_queue.run_repeating(
-            callback_auto_remind_message,
-            timedelta(hours=REMIND_LONG_OUT_HRS),
-            first=next_interval_time(person.status.update_time, REMIND_SHORT_OUT_HRS),
-            chat_id=person.chat_id,
-            name=str(person.chat_id),
-        )
-
-    elif person.status.status_name == StatusName.short_out:
-        job_queue.run_repeating(
-            callback_auto_remind_message,
-            timedelta(hours=REMIND_SHORT_OUT_HRS),
-            first=next_interval_time(person.status.update_time, REMIND_SHORT_OUT_HRS),
-            chat_id=person.chat_id,
-            name=str(person.chat_id),
-        )
-
-
 async def update_person_status(
     chat_id: int, status: StatusName, context: CallbackContext
 ):
     person = persons_by_chat_id[chat_id]
     person.status = Status(status_name=status, update_time=datetime.now())
+    invalidate("here")
     update_person_sheet_status(person.row, person.status)
     logging.info(f"{person.name} change his status to {person.status}")
     msg = (
@@ -683,7 +730,7 @@ async def update_person_status(
         f"{translator.get('Status change to')} "
         f"{person.status.status_name.value}"
     )
-    await notify_channel(channel_id=MAIN_CHANNEL_ID, message=msg, context=context)
+    notify_channel(channel_id=MAIN_CHANNEL_ID, message=msg)
 
 
 async def ask_change(
@@ -703,15 +750,20 @@ async def ask_change(
     task_to_change = None
     if to_change_shift:
         sheet_index, row, cols = to_change_shift.split("_", maxsplit=2)
-        task_to_change = get_task_by_cell(
+        task_to_change = await run_sheet_call(
+            get_task_by_cell,
             int(sheet_index),
             int(row),
             [int(c) for c in cols.split("_")],
             to_change_person,
         )
     sheet_index, row, cols = requested_shift.split("_", maxsplit=2)
-    required_task = get_task_by_cell(
-        int(sheet_index), int(row), [int(c) for c in cols.split("_")], required_person
+    required_task = await run_sheet_call(
+        get_task_by_cell,
+        int(sheet_index),
+        int(row),
+        [int(c) for c in cols.split("_")],
+        required_person,
     )
     inline_keyboard = [
         [
@@ -735,9 +787,10 @@ async def ask_change(
         f"{translator.get('within')} \n"
         f"{required_task.description(with_time=True) if required_task else ''} \n"
     )
-    await context.bot.send_message(
-        chat_id=required_person.chat_id,
-        text=msg,
+    outbox.put(
+        required_person.chat_id,
+        msg,
+        MessagePriority.reply,
         reply_markup=InlineKeyboardMarkup(inline_keyboard),
     )
 
@@ -750,7 +803,9 @@ async def ask_shift_to_change(
     action: str, chat_id: int, msg: str, query: CallbackQuery
 ):
     change_person = persons_by_chat_id[chat_id]
-    change_tasks = get_tasks(now=False, person=change_person, start_from=datetime.now())
+    change_tasks = await run_sheet_call(
+        get_tasks, now=False, person=change_person, start_from=datetime.now()
+    )
     inline_keyboard = []
     for task in change_tasks:
         task_cols = "_".join([str(i) for i in task.cols])
@@ -797,7 +852,7 @@ async def ask_who_change(action: str, query: CallbackQuery):
 
 
 async def show_replace(sheet_index: str, row: str, cols: str, query: CallbackQuery):
-    replacers = get_replacers(sheet_index, row, cols)
+    replacers = await run_sheet_call(get_replacers, sheet_index, row, cols)
     msg = translator.get("Your replacer are")
     msg += ": \n"
     for name in replacers:
@@ -808,8 +863,11 @@ async def show_replace(sheet_index: str, row: str, cols: str, query: CallbackQue
 
 async def ask_replace(chat_id: int, query: CallbackQuery):
     person = persons_by_chat_id.get(chat_id)
-    tasks = get_tasks(
-        now=False, person=person, start_from=datetime.now() - timedelta(minutes=30)
+    tasks = await run_sheet_call(
+        get_tasks,
+        now=False,
+        person=person,
+        start_from=datetime.now() - timedelta(minutes=30),
     )
     inline_keyboard = []
     for task in tasks:
@@ -835,22 +893,13 @@ async def send_ics(
     query: CallbackQuery, chat_id: int, context: CallbackContext
 ) -> None:
     person = persons_by_chat_id.get(chat_id)
-    tasks = get_tasks(now=False, person=person, start_from=datetime.now())
-
-    # Create the .ics file
-    cal = Calendar()
-    for task in tasks:
-        event = Event()
-        event.name = task.task_name
-        event.begin = convert_to_gmt2(task.start)
-        event.end = convert_to_gmt2(task.end)
-        description = "\n".join(task.members_description)
-        event.description = description
-        cal.events.add(event)
+    tasks = await run_sheet_call(
+        get_tasks, now=False, person=person, start_from=datetime.now()
+    )
 
     # Save to a BytesIO object
     ics_buffer = BytesIO()
-    ics_buffer.write(bytes(str(cal), "utf-8"))
+    ics_buffer.write(bytes(generate_ics(tasks), "utf-8"))
     ics_buffer.seek(0)
 
     # Send the file to the user
@@ -1009,7 +1058,7 @@ async def handle_action(
 
 async def change_shift(chat_id, query):
     person = persons_by_chat_id.get(chat_id)
-    tasks = get_tasks(now=False, person=person)
+    tasks = await run_sheet_call(get_tasks, now=False, person=person)
     keyboard = []
     for task in tasks:
         task_cols = "_".join([str(i) for i in task.cols])
@@ -1029,6 +1078,7 @@ async def change_shift(chat_id, query):
     )
 
 
+@request_scoped
 async def button(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
@@ -1040,10 +1090,9 @@ async def button(update: Update, context: CallbackContext):
         await query.edit_message_text(
             text=translator.get("Something went wrong"), reply_markup=return_menu_markup
         )
-        await notify_channel(
+        notify_channel(
             channel_id=DEV_CHANNEL_ID,
             message=f"Error occurred: {error.__class__.__name__}\n\n{str(error)}",
-            context=context,
         )
 
 
@@ -1054,10 +1103,56 @@ async def done(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 
+async def send_due_reminders(context: CallbackContext):
+    """Send all the reminders due by now with a single fan-out"""
+    due_persons = [
+        persons_by_chat_id[chat_id]
+        for chat_id in reminders.pop_due()
+        if chat_id in persons_by_chat_id
+    ]
+    # saved by the bot persistence, to restore the reminders after a restart
+    context.bot_data[REMINDERS_KEY] = reminders.snapshot()
+    if not due_persons:
+        return
+
+    messages = []
+    for person in due_persons:
+        msg, reply_markup = reminder_message(person)
+        messages.append((person.chat_id, msg, {"reply_markup": reply_markup}))
+    deliveries = await fanout.send_many(context.bot, messages)
+    reminded = [
+        person.name
+        for person, delivery in zip(due_persons, deliveries)
+        if delivery.delivered
+    ]
+    notify_channel(
+        channel_id=DEV_CHANNEL_ID,
+        message=f"System remind {len(reminded)} persons: {', '.join(reminded)}",
+    )
+
+
+@background
+async def flush_sheet_writes(_: CallbackContext):
+    try:
+        await run_sheet_call(flush_persons_writes)
+    except Exception as e:
+        logging.exception(f"Failed to flush sheet writes due to {str(e)}")
+
+
+@background
+async def sync_sheet_storage(_: CallbackContext):
+    try:
+        await run_sheet_call(sync_storage_with_sheet)
+    except Exception as e:
+        logging.exception(f"Failed to sync local store with sheet due to {str(e)}")
+
+
 def global_init():
+    warm_up_sheet()
     loaded_teams, loaded_persons = get_teams_and_persons()
     teams.update(loaded_teams)
     persons.update(loaded_persons)
     for person in persons.values():
         if person.chat_id:
             persons_by_chat_id[person.chat_id] = person
+    released_names[:] = get_released_members()
@@ -0,0 +1,227 @@
+"""
+In-memory stand-in for the gspread spreadsheet and worksheet objects used by the bot.
+It needs no network or service account, so it is used for tests and for counting
+the sheets calls of each bot flow.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+
+import requests
+from gspread.cell import Cell
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, fill_gaps
+
+
+def quota_error(status_code: int = 429) -> APIError:
+    """API error as raised by gspread when the sheets quota is exceeded"""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(
+        {
+            "error": {
+                "code": status_code,
+                "message": "Quota exceeded for quota metric 'Read requests'",
+                "status": "RESOURCE_EXHAUSTED",
+            }
+        }
+    ).encode()
+    return APIError(response)
+
+
+def split_range(range_name: str) -> tuple[str, str | None]:
+    """Split `'tab'!A1:B2` into the tab title and the A1 range"""
+    title, _, cells = range_name.partition("!")
+    return title.strip("'").replace("''", "'"), cells or None
+
+
+class FakeWorksheet:
+    def __init__(
+        self,
+        spreadsheet: "FakeSpreadsheet",
+        title: str,
+        index: int,
+        values: list[list[str]],
+    ):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.index = index
+        self.id = 1000 + index
+        self.values = [[str(value) for value in row] for row in values]
+
+    def __repr__(self):
+        return f"<FakeWorksheet {self.title!r} index:{self.index}>"
+
+    def get_all_values(self, **kwargs) -> list[list[str]]:
+        self.spreadsheet.call("get_all_values")
+        return self.read_range()
+
+    def get_values(self, range_name: str = None, **kwargs) -> list[list[str]]:
+        self.spreadsheet.call("get_values")
+        return self.read_range(range_name)
+
+    def cell(self, row: int, col: int, **kwargs) -> Cell:
+        self.spreadsheet.call("cell")
+        return Cell(row, col, self.get_cell(row, col))
+
+    def update_cell(self, row: int, col: int, value):
+        self.spreadsheet.call("update_cell")
+        self.set_cell(row, col, value)
+
+    def batch_update(self, data: list[dict], **kwargs):
+        self.spreadsheet.call("batch_update")
+        for update in data:
+            self.write_range(update["range"], update["values"])
+
+    def get_cell(self, row: int, col: int) -> str | None:
+        if row <= len(self.values) and col <= len(self.values[row - 1]):
+            return self.values[row - 1][col - 1]
+        return None
+
+    def set_cell(self, row: int, col: int, value):
+        while len(self.values) < row:
+            self.values.append([])
+        row_values = self.values[row - 1]
+        row_values.extend([""] * (col - len(row_values)))
+        row_values[col - 1] = "" if value is None else str(value)
+
+    def read_range(self, range_name: str = None) -> list[list[str]]:
+        if not range_name:
+            # copies, so later writes do not change rows a caller already holds
+            return fill_gaps([list(row) for row in self.values])
+
+        grid = a1_range_to_grid_range(range_name)
+        rows = self.values[
+            grid.get("startRowIndex", 0) : grid.get("endRowIndex", len(self.values))
+        ]
+        first_col = grid.get("startColumnIndex", 0)
+        last_col = grid.get("endColumnIndex")
+        values = [row[first_col:last_col] for row in rows]
+        # like the sheets API, trailing empty rows and cells are not returned
+        values = [row[: _filled_length(row)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write_range(self, range_name: str, values: list[list]):
+        grid = a1_range_to_grid_range(range_name)
+        first_row = grid.get("startRowIndex", 0) + 1
+        first_col = grid.get("startColumnIndex", 0) + 1
+        for i, row_values in enumerate(values):
+            for j, value in enumerate(row_values):
+                self.set_cell(first_row + i, first_col + j, value)
+
+
+def _filled_length(row: list[str]) -> int:
+    length = len(row)
+    while length and not row[length - 1]:
+        length -= 1
+    return length
+
+
+class FakeSpreadsheet:
+    """
+    Spreadsheet of fake worksheets, tabs are given as {title: values}.
+    Every API call is counted in `calls`, waits `latency` seconds and raises
+    a quota error while `fail_next` errors are pending.
+    """
+
+    def __init__(
+        self, tabs: dict[str, list[list[str]]], title: str = "fake", latency: float = 0
+    ):
+        self.title = title
+        self.latency = latency
+        self.fail_next = 0
+        self.fail_status_code = 429
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._worksheets = [
+            FakeWorksheet(self, tab_title, i, values)
+            for i, (tab_title, values) in enumerate(tabs.items())
+        ]
+
+    def call(self, method: str):
+        with self._lock:
+            self.calls[method] += 1
+            failing = self.fail_next > 0
+            if failing:
+                self.fail_next -= 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise quota_error(self.fail_status_code)
+
+    def fail(self, count: int = 1, status_code: int = 429):
+        """Fail the next `count` calls with the given status code"""
+        self.fail_next = count
+        self.fail_status_code = status_code
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def add_worksheet(self, title: str, values: list[list[str]] = None):
+        worksheet = FakeWorksheet(self, title, len(self._worksheets), values or [])
+        self._worksheets.append(worksheet)
+        return worksheet
+
+    def reorder_worksheets(self, worksheets_in_desired_order: list[FakeWorksheet]):
+        self.call("reorder_worksheets")
+        self._worksheets = list(worksheets_in_desired_order)
+        for index, worksheet in enumerate(self._worksheets):
+            worksheet.index = index
+
+    def _worksheet(self, title: str) -> FakeWorksheet:
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise WorksheetNotFound(title)
+
+    def worksheets(self, **kwargs) -> list[FakeWorksheet]:
+        self.call("worksheets")
+        return list(self._worksheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.call("worksheet")
+        return self._worksheet(title)
+
+    def get_worksheet(self, index: int) -> FakeWorksheet | None:
+        self.call("get_worksheet")
+        if 0 <= index < len(self._worksheets):
+            return self._worksheets[index]
+        return None
+
+    def get_worksheet_by_id(self, worksheet_id: int) -> FakeWorksheet:
+        self.call("get_worksheet_by_id")
+        for worksheet in self._worksheets:
+            if worksheet.id == worksheet_id:
+                return worksheet
+        raise WorksheetNotFound(f"id {worksheet_id} not found")
+
+    def values_batch_get(self, ranges: list[str], params: dict = None) -> dict:
+        self.call("values_batch_get")
+        value_ranges = []
+        for range_name in ranges:
+            title, cells = split_range(range_name)
+            value_range = {"range": range_name}
+            if values := self._worksheet(title).read_range(cells):
+                value_range["values"] = values
+            value_ranges.append(value_range)
+        return {"valueRanges": value_ranges}
+
+    def values_batch_update(self, body: dict = None, params: dict = None) -> dict:
+        self.call("values_batch_update")
+        for update in body["data"]:
+            title, cells = split_range(update["range"])
+            self._worksheet(title).write_range(cells, update["values"])
+        return {
+            "totalUpdatedCells": sum(
+                len(row) for u in body["data"] for row in u["values"]
+            )
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from on_call_bot.configuration import (
+    FANOUT_CHAT_INTERVAL_SECS,
+    FANOUT_MAX_RETRIES,
+    FANOUT_MESSAGES_PER_SEC,
+)
+from on_call_bot.quota import TokenBucket
+
+
+@dataclass
+class Delivery:
+    chat_id: int | str
+    delivered: bool = False
+    attempts: int = 0
+    error: str | None = None
+    # the message was rejected by telegram, sending it again will not help
+    rejected: bool = False
+
+
+def retry_after_secs(error: RetryAfter) -> float:
+    if isinstance(error.retry_after, timedelta):
+        return error.retry_after.total_seconds()
+    return float(error.retry_after)
+
+
+class FanOut:
+    """
+    Send a message to many chats concurrently, within the telegram rate limits:
+    `messages_per_sec` for the whole bot and one message per `chat_interval` per chat.
+    Flood control (RetryAfter) pauses all sends for the requested time, network errors
+    are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        messages_per_sec: float = FANOUT_MESSAGES_PER_SEC,
+        chat_interval: float = FANOUT_CHAT_INTERVAL_SECS,
+        max_retries: int = FANOUT_MAX_RETRIES,
+        backoff_base: float = 1,
+    ):
+        self.bucket = TokenBucket(messages_per_sec * 60, capacity=messages_per_sec)
+        self.chat_interval = chat_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._next_send_at: dict[int | str, float] = {}
+        self._paused_until = 0.0
+
+    async def _wait_turn(self, chat_id: int | str):
+        while True:
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self._next_send_at.get(chat_id, 0) - now,
+            )
+            if wait <= 0:
+                wait = self.bucket.try_acquire()
+                if not wait:
+                    self._next_send_at[chat_id] = now + self.chat_interval
+                    return
+            await asyncio.sleep(wait)
+
+    async def send_one(
+        self, bot: Bot, chat_id: int | str, text: str, **kwargs
+    ) -> Delivery:
+        delivery = Delivery(chat_id=chat_id)
+        while True:
+            await self._wait_turn(chat_id)
+            delivery.attempts += 1
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                delivery.delivered = True
+                delivery.error = None
+                return delivery
+            except RetryAfter as e:
+                delivery.error = str(e)
+                delay = retry_after_secs(e)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            except (BadRequest, Forbidden) as e:
+                # BadRequest is a NetworkError subclass, but retrying will not help
+                delivery.error = str(e)
+                delivery.rejected = True
+                return delivery
+            except NetworkError as e:
+                delivery.error = str(e)
+                delay = random.uniform(
+                    0, self.backoff_base * 2 ** (delivery.attempts - 1)
+                )
+            except Exception as e:
+                delivery.error = str(e)
+                return delivery
+
+            if delivery.attempts > self.max_retries:
+                return delivery
+            logging.warning(
+                f"Sending to {chat_id} failed due to {delivery.error}, retry in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def send(
+        self, bot: Bot, chat_ids: list[int | str], text: str, **kwargs
+    ) -> list[Delivery]:
+        """Send the message to all chats, return the delivery result of each chat"""
+        return await self.send_many(
+            bot, [(chat_id, text, kwargs) for chat_id in dict.fromkeys(chat_ids)]
+        )
+
+    async def send_many(
+        self, bot: Bot, messages: list[tuple[int | str, str, dict]]
+    ) -> list[Delivery]:
+        """Send a (chat_id, text, kwargs) message to each chat concurrently"""
+        deliveries = await asyncio.gather(
+            *[
+                self.send_one(bot, chat_id, text, **kwargs)
+                for chat_id, text, kwargs in messages
+            ]
+        )
+        failed = [delivery for delivery in deliveries if not delivery.delivered]
+        if failed:
+            logging.error(
+                f"Failed to send to {len(failed)} of {len(deliveries)} chats: "
+                + ", ".join(f"{d.chat_id} ({d.error})" for d in failed)
+            )
+        return deliveries
+
+
+fanout = FanOut()
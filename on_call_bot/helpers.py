@@ -1,10 +1,14 @@
 from datetime import datetime
 
+from ics import Calendar, Event
+
 from on_call_bot import translator
-from on_call_bot.configuration import TASKS_SHEET_NAMES
+from on_call_bot.configuration import RELEASES_SHEET_NAME, TASKS_SHEET_NAMES
 from on_call_bot.globals import persons
+from on_call_bot.instrumentation import timed
 from on_call_bot.models import Person, Task
-from on_call_bot.sheet_helpers import get_tasks_from_sheet
+from on_call_bot.sheet_helpers import fetch_tabs, get_tasks_from_sheet
+from on_call_bot.utils import convert_to_gmt2
 
 
 def generate_who_is_here_message(
@@ -50,6 +54,22 @@ def generate_who_is_here_message(
     return msg
 
 
+def generate_ics(tasks: list[Task]) -> str:
+    """Calendar file content with an event per task"""
+    cal = Calendar()
+    for task in tasks:
+        event = Event()
+        event.name = task.task_name
+        event.begin = convert_to_gmt2(task.start)
+        event.end = convert_to_gmt2(task.end)
+        description = "\n".join(task.members_description)
+        event.description = description
+        cal.events.add(event)
+
+    return str(cal)
+
+
+@timed
 def get_tasks(
     now: bool = False,
     person: Person = None,
@@ -58,6 +78,7 @@ def get_tasks(
 ) -> list[Task]:
     """Get all tasks sorted by start time"""
     tasks = []
+    fetch_tabs(TASKS_SHEET_NAMES + [RELEASES_SHEET_NAME])
     for sheet_name in TASKS_SHEET_NAMES:
         tasks.extend(
             get_tasks_from_sheet(
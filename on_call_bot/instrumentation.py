@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+
+from on_call_bot.configuration import LOG_SAMPLE_EVERY
+
+SHEET_CALLS = "sheet_calls"
+ROWS_PARSED = "rows_parsed"
+
+
+class Metrics:
+    """Counters and per function timers (seconds) of a single update or of the whole process"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.timings = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def count(self, metric: str, n: int = 1):
+        with self._lock:
+            self.counters[metric] += n
+
+    def add_time(self, metric: str, seconds: float):
+        with self._lock:
+            self.timings[metric] += seconds
+
+    def summary(self) -> str:
+        msg = (
+            f"{self.counters[ROWS_PARSED]} rows parsed, "
+            f"{self.counters[SHEET_CALLS]} sheet calls"
+        )
+        if self.timings:
+            timings = sorted(self.timings.items(), key=lambda t: t[1], reverse=True)
+            msg += " (" + ", ".join(f"{f} {s * 1000:.1f}ms" for f, s in timings) + ")"
+        return msg
+
+
+process_metrics = Metrics()
+current_metrics: ContextVar[Metrics | None] = ContextVar(
+    "current_metrics", default=None
+)
+_occurrences = Counter()
+
+
+def count(metric: str, n: int = 1):
+    """Count for the whole process and for the current update, if any"""
+    process_metrics.count(metric, n)
+    if metrics := current_metrics.get():
+        metrics.count(metric, n)
+
+
+def add_time(metric: str, seconds: float):
+    process_metrics.add_time(metric, seconds)
+    if metrics := current_metrics.get():
+        metrics.add_time(metric, seconds)
+
+
+def timed(func):
+    """Add the run time of the function to its timer"""
+
+    @wraps(func)
+    def timed_func(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            add_time(func.__name__, time.perf_counter() - start)
+
+    return timed_func
+
+
+def log_sampled(key: str, message: Callable[[], str], every: int = LOG_SAMPLE_EVERY):
+    """
+    Debug log of a hot path event, only every `every` occurrences of the key.
+    The message is formatted only when it is logged.
+    """
+    _occurrences[key] += 1
+    occurrences = _occurrences[key]
+    if occurrences % every == 1 or every == 1:
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"{message()} ({occurrences} times)")
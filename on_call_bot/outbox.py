@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from telegram import Bot, InlineKeyboardMarkup
+
+from on_call_bot.configuration import OUTBOX_JOURNAL, OUTBOX_RETRY_SECS, OUTBOX_WORKERS
+from on_call_bot.fanout import FanOut, fanout
+
+
+class MessagePriority(IntEnum):
+    reply = 0
+    alert = 1
+    log = 2
+
+
+@dataclass(order=True)
+class OutgoingMessage:
+    priority: MessagePriority
+    seq: int
+    chat_id: int | str = field(compare=False)
+    text: str = field(compare=False)
+    reply_markup: dict | None = field(default=None, compare=False)
+
+
+class Outbox:
+    """
+    Outgoing telegram messages, sent by background workers in priority order:
+    replies to users, then commander alerts, then channel logs.
+    Every queued and sent message is appended to a local journal,
+    so unsent messages survive a restart. A message that could not be sent is
+    queued again after `retry_secs`, unless telegram rejected it.
+    """
+
+    def __init__(
+        self,
+        journal_path: str | None = None,
+        sender: FanOut = fanout,
+        retry_secs: float = OUTBOX_RETRY_SECS,
+    ):
+        self.journal_path = journal_path
+        self.sender = sender
+        self.retry_secs = retry_secs
+        self.sent = 0
+        self.failed = 0
+        self._queue: asyncio.PriorityQueue[OutgoingMessage] = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._workers: list[asyncio.Task] = []
+        self._sending = 0
+        self._load_journal()
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def _load_journal(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+
+        pending = {}
+        with open(self.journal_path, "r") as journal:
+            for line in journal:
+                if line.strip():
+                    entry = json.loads(line)
+                    if entry.pop("sent", False):
+                        pending.pop(entry["seq"], None)
+                    else:
+                        entry["priority"] = MessagePriority(entry["priority"])
+                        pending[entry["seq"]] = OutgoingMessage(**entry)
+
+        self._seq = itertools.count(max(pending, default=-1) + 1)
+        self._rewrite_journal(pending.values())
+        for message in pending.values():
+            self._queue.put_nowait(message)
+        logging.info(f"Loaded {len(self)} pending messages from outbox journal")
+
+    def _journal(self, entry: dict):
+        if self.journal_path:
+            with open(self.journal_path, "a") as journal:
+                journal.write(json.dumps(entry))
+                journal.write("\n")
+
+    def _rewrite_journal(self, messages):
+        if not self.journal_path:
+            return
+
+        with open(self.journal_path, "w") as journal:
+            for message in messages:
+                journal.write(json.dumps(message.__dict__))
+                journal.write("\n")
+
+    def put(
+        self,
+        chat_id: int | str,
+        text: str,
+        priority: MessagePriority,
+        reply_markup: InlineKeyboardMarkup = None,
+    ):
+        """Queue a message, without waiting for it to be sent"""
+        if not chat_id:
+            return
+
+        message = OutgoingMessage(
+            priority=priority,
+            seq=next(self._seq),
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup.to_dict() if reply_markup else None,
+        )
+        self._journal(message.__dict__)
+        self._queue.put_nowait(message)
+
+    async def _send(self, bot: Bot, message: OutgoingMessage) -> bool:
+        """Send the message, return whether it is done with (sent or rejected)"""
+        reply_markup = InlineKeyboardMarkup.de_json(message.reply_markup, bot)
+        delivery = await self.sender.send_one(
+            bot, message.chat_id, message.text, reply_markup=reply_markup
+        )
+        if delivery.delivered:
+            self.sent += 1
+        elif delivery.rejected:
+            self.failed += 1
+            logging.error(
+                f"Dropped {message.priority.name} message to {message.chat_id}, "
+                f"rejected by telegram: {delivery.error}"
+            )
+        else:
+            logging.warning(
+                f"Failed to send {message.priority.name} message to {message.chat_id} "
+                f"due to {delivery.error}, retry in {self.retry_secs}s"
+            )
+        return delivery.delivered or delivery.rejected
+
+    async def _work(self, bot: Bot):
+        while True:
+            message = await self._queue.get()
+            self._sending += 1
+            try:
+                try:
+                    done = await self._send(bot, message)
+                except Exception as e:
+                    done = False
+                    logging.exception(
+                        f"Failed to send to {message.chat_id} due to {e}, "
+                        f"retry in {self.retry_secs}s"
+                    )
+
+                # a worker stopped while sending or waiting to retry does not get
+                # here, so the message stays pending in the journal
+                if done:
+                    self._journal({"seq": message.seq, "sent": True})
+                else:
+                    await asyncio.sleep(self.retry_secs)
+                    self._queue.put_nowait(message)
+            finally:
+                self._sending -= 1
+                self._queue.task_done()
+
+            if not self._queue.qsize() and not self._sending:
+                self._rewrite_journal([])
+
+    def start(self, bot: Bot, workers: int = OUTBOX_WORKERS):
+        self._workers = [asyncio.create_task(self._work(bot)) for _ in range(workers)]
+
+    async def join(self):
+        """Wait for all queued messages to be sent"""
+        await self._queue.join()
+
+    async def stop(self):
+        """Stop the workers, messages still queued stay in the journal"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logging.info(
+            f"Outbox: {self.sent} sent, {self.failed} failed, {len(self)} pending"
+        )
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "pending": len(self)}
+
+
+outbox = Outbox(OUTBOX_JOURNAL)
@@ -0,0 +1,178 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from enum import Enum
+from functools import wraps
+from typing import Callable, TypeVar
+
+from gspread.exceptions import APIError
+
+from on_call_bot.configuration import (
+    SHEET_BACKOFF_BASE_SECS,
+    SHEET_BACKOFF_MAX_SECS,
+    SHEET_CALL_TIMEOUT_SECS,
+    SHEET_INTERACTIVE_RESERVE,
+    SHEET_MAX_RETRIES,
+    SHEET_READS_PER_MINUTE,
+    SHEET_WRITES_PER_MINUTE,
+)
+
+T = TypeVar("T")
+
+
+class Priority(Enum):
+    interactive = "interactive"
+    background = "background"
+
+
+current_priority: ContextVar[Priority] = ContextVar(
+    "current_priority", default=Priority.interactive
+)
+
+
+class TokenBucket:
+    """
+    Rate limiter that refills `rate_per_minute` tokens a minute, up to `capacity`
+    tokens (a minute worth by default).
+    Background calls leave `reserve` of the capacity to interactive calls.
+    """
+
+    def __init__(
+        self, rate_per_minute: float, reserve: float = 0, capacity: float = None
+    ):
+        self.capacity = float(capacity or rate_per_minute)
+        self.rate = rate_per_minute / 60
+        self.reserve = self.capacity * reserve
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def try_acquire(self, priority: Priority = Priority.interactive) -> float:
+        """Take a token, or return the seconds to wait before trying again"""
+        needed = 1 + (self.reserve if priority == Priority.background else 0)
+        with self._lock:
+            self._refill()
+            if self._tokens >= needed:
+                self._tokens -= 1
+                return 0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, priority: Priority = Priority.interactive) -> float:
+        """Take a token, waiting for it if needed. Return the seconds waited"""
+        waited = 0
+        while wait := self.try_acquire(priority):
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+
+def is_retryable(error: APIError) -> bool:
+    status_code = error.response.status_code
+    return status_code == 429 or status_code >= 500
+
+
+class SheetQuota:
+    """
+    Guard of Google sheets API calls: reads and writes take a token from their own bucket,
+    and quota (429) or server (5xx) errors are retried with jittered exponential backoff.
+    Interactive calls are not retried past `interactive_timeout`, when their handler
+    has stopped waiting for them.
+    """
+
+    def __init__(
+        self,
+        reads_per_minute: float = SHEET_READS_PER_MINUTE,
+        writes_per_minute: float = SHEET_WRITES_PER_MINUTE,
+        interactive_reserve: float = SHEET_INTERACTIVE_RESERVE,
+        max_retries: int = SHEET_MAX_RETRIES,
+        backoff_base: float = SHEET_BACKOFF_BASE_SECS,
+        backoff_max: float = SHEET_BACKOFF_MAX_SECS,
+        interactive_timeout: float = SHEET_CALL_TIMEOUT_SECS,
+    ):
+        self.reads = TokenBucket(reads_per_minute, interactive_reserve)
+        self.writes = TokenBucket(writes_per_minute, interactive_reserve)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.interactive_timeout = interactive_timeout
+        self.throttled = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _retry_delay(
+        self, error: APIError, attempt: int, deadline: float | None
+    ) -> float | None:
+        """Seconds to wait before retrying the failed call, or None to give up"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = self.backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _call(self, bucket: TokenBucket, func: Callable[..., T], *args, **kwargs) -> T:
+        priority = current_priority.get()
+        deadline = (
+            time.monotonic() + self.interactive_timeout
+            if priority == Priority.interactive
+            else None
+        )
+        attempt = 0
+        while True:
+            if bucket.acquire(priority):
+                with self._lock:
+                    self.throttled += 1
+
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+
+                attempt += 1
+                with self._lock:
+                    self.retried += 1
+                logging.warning(
+                    f"Sheet call {func.__name__} failed with {e.response.status_code}, "
+                    f"retry {attempt} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def read(self, func: Callable[..., T], *args, **kwargs) -> T:
+        return self._call(self.reads, func, *args, **kwargs)
+
+    def write(self, func: Callable[..., T], *args, **kwargs) -> T:
+        return self._call(self.writes, func, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {"throttled": self.throttled, "retried": self.retried}
+
+
+def background(job):
+    """Run the sheet calls of a job behind the interactive ones"""
+
+    @wraps(job)
+    async def background_job(*args, **kwargs):
+        token = current_priority.set(Priority.background)
+        try:
+            return await job(*args, **kwargs)
+        finally:
+            current_priority.reset(token)
+
+    return background_job
+
+
+sheet_quota = SheetQuota()
@@ -0,0 +1,107 @@
+import heapq
+import itertools
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+# bot_data key of the reminders snapshot
+REMINDERS_KEY = "reminders"
+
+
+@dataclass(slots=True)
+class Reminder:
+    chat_id: int
+    due: datetime
+    interval: timedelta
+    seq: int
+
+
+class ReminderScheduler:
+    """
+    Repeating status reminders of all persons, in a single heap ordered by due time.
+    Scheduling is O(log n). Cancelled and rescheduled reminders stay in the heap
+    until they are popped (lazy deletion), so cancel is O(1).
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, int, int]] = []
+        self._reminders: dict[int, Reminder] = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def __contains__(self, chat_id: int):
+        return chat_id in self._reminders
+
+    def _push(self, reminder: Reminder):
+        heapq.heappush(self._heap, (reminder.due, reminder.seq, reminder.chat_id))
+
+    def schedule(self, chat_id: int, interval: timedelta, first: datetime = None):
+        """Remind every `interval` from `first` (one interval from now by default)"""
+        reminder = Reminder(
+            chat_id=chat_id,
+            due=first or datetime.now() + interval,
+            interval=interval,
+            seq=next(self._seq),
+        )
+        self._reminders[chat_id] = reminder
+        self._push(reminder)
+        # drop the stale entries once they are most of the heap
+        if len(self._heap) > 2 * len(self._reminders) + 64:
+            self._compact()
+
+    def cancel(self, chat_id: int):
+        self._reminders.pop(chat_id, None)
+
+    def _compact(self):
+        self._heap = [
+            (reminder.due, reminder.seq, reminder.chat_id)
+            for reminder in self._reminders.values()
+        ]
+        heapq.heapify(self._heap)
+
+    def snapshot(self) -> dict[int, tuple[datetime, timedelta]]:
+        """Due time and interval of every reminder, by chat id"""
+        return {
+            chat_id: (reminder.due, reminder.interval)
+            for chat_id, reminder in self._reminders.items()
+        }
+
+    def restore(self, snapshot: dict[int, tuple[datetime, timedelta]]):
+        """Replace all reminders with the snapshot ones, with a single heapify"""
+        self._reminders = {
+            chat_id: Reminder(
+                chat_id=chat_id, due=due, interval=interval, seq=next(self._seq)
+            )
+            for chat_id, (due, interval) in snapshot.items()
+        }
+        self._compact()
+
+    def next_due(self) -> datetime | None:
+        while self._heap:
+            due, seq, chat_id = self._heap[0]
+            reminder = self._reminders.get(chat_id)
+            if reminder and reminder.seq == seq:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: datetime = None) -> list[int]:
+        """
+        Pop the chats with a reminder due by now, and schedule their next reminder.
+        A reminder missed more than once (e.g. while the bot was down) is due once.
+        """
+        now = now or datetime.now()
+        due_chat_ids = []
+        while (due := self.next_due()) and due <= now:
+            _, _, chat_id = heapq.heappop(self._heap)
+            reminder = self._reminders[chat_id]
+            due_chat_ids.append(chat_id)
+            while reminder.due <= now:
+                reminder.due += reminder.interval
+            reminder.seq = next(self._seq)
+            self._push(reminder)
+        return due_chat_ids
+
+
+reminders = ReminderScheduler()
@@ -0,0 +1,97 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from on_call_bot.instrumentation import SHEET_CALLS, Metrics, count, current_metrics
+
+T = TypeVar("T")
+
+
+class RequestContext:
+    """Data derived while handling a single telegram update, computed at most once"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.metrics = Metrics()
+        self.started_at = time.perf_counter()
+        self._memo: dict[Hashable, object] = {}
+
+    @property
+    def sheet_calls(self) -> int:
+        return self.metrics.counters[SHEET_CALLS]
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        return f"{self.name}: {self.metrics.summary()}, {elapsed * 1000:.1f}ms"
+
+    def memoize(self, key: Hashable, compute: Callable[[], T]) -> T:
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    async def memoize_async(
+        self, key: Hashable, compute: Callable[[], Awaitable[T]]
+    ) -> T:
+        if key not in self._memo:
+            self._memo[key] = await compute()
+        return self._memo[key]
+
+    def invalidate(self, *keys: Hashable):
+        for key in keys:
+            self._memo.pop(key, None)
+
+
+current_request: ContextVar[RequestContext | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+@contextmanager
+def request_scope(name: str):
+    """Run the block with a fresh request context"""
+    request = RequestContext(name)
+    token = current_request.set(request)
+    metrics_token = current_metrics.set(request.metrics)
+    try:
+        yield request
+    finally:
+        current_metrics.reset(metrics_token)
+        current_request.reset(token)
+        logging.info(request.summary())
+
+
+def request_scoped(handler):
+    """Handle each telegram update within its own request context"""
+
+    @wraps(handler)
+    async def scoped_handler(update, context):
+        with request_scope(handler.__name__):
+            return await handler(update, context)
+
+    return scoped_handler
+
+
+def count_sheet_call():
+    """Count a Google sheets API call, for the current request if any"""
+    count(SHEET_CALLS)
+
+
+def memoize(key: Hashable, compute: Callable[[], T]) -> T:
+    """Compute once per current request, or on every call outside of a request"""
+    if request := current_request.get():
+        return request.memoize(key, compute)
+    return compute()
+
+
+async def memoize_async(key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+    if request := current_request.get():
+        return await request.memoize_async(key, compute)
+    return await compute()
+
+
+def invalidate(*keys: Hashable):
+    if request := current_request.get():
+        request.invalidate(*keys)
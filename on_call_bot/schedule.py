@@ -0,0 +1,374 @@
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from on_call_bot.consts import (
+    DATA_ROW_IDX,
+    DATE_IDX,
+    HEADERS_ROW_IDX,
+    MEMBERS_IDX,
+    TASK_NAMES_IDX,
+    TIME_IDX,
+)
+from on_call_bot.instrumentation import ROWS_PARSED, count, log_sampled
+from on_call_bot.sheet_cache import TabSnapshot
+from on_call_bot.utils import (
+    convert_date_time_columns,
+    extract_and_convert_to_datetime,
+    index_strings,
+    inherit_blank_dates,
+)
+
+
+@dataclass(slots=True)
+class Shift:
+    row: int
+    start: datetime
+    end: datetime
+    names: list[str]
+    # integer codes of the names, 0 for an empty cell
+    codes: tuple[int, ...] = ()
+
+
+class ShiftIndex:
+    """
+    Parsed shifts of a single tasks tab, sorted by start time.
+    Since shifts are bounded by the longest shift duration, any shift that
+    overlaps a time range starts at most `max_duration` before the range.
+    Person cells are kept in an inverted index of name -> (sheet_index, row, col)
+    so per-person queries only touch that person's shifts.
+    Member names are coded as integers, so matching tasks and persons is done on
+    the shift codes and `Task` objects are only built for the matching tasks.
+    An index is never changed once it is shared: `refresh` returns a new index,
+    so queries from other threads always see a single tab version. The new index
+    shares the shifts and the cell lists of persons on unchanged rows.
+    """
+
+    def __init__(self, title: str, index: int, values: list[list[str]], version=0):
+        self.title = title
+        self.index = index
+        self.version = version
+        self.task_indexes = {}
+        self.names: list[str] = [""]
+        self._codes: dict[str, int] = {"": 0}
+        self.max_duration = timedelta(0)
+        self._shifts: list[Shift] = []
+        self._starts: list[datetime] = []
+        # by data row position, which is the sheet row - 2
+        self._shifts_by_row: list[Shift | None] = []
+        self._row_hashes: list[int] = []
+        self._cells_by_name: dict[str, list[tuple[int, int, int]]] = {}
+        # names whose cell list is not shared with the index this one was copied from
+        self._own_cell_lists: set[str] = set()
+        self._update_task_names(values)
+        for row, date_value, row_values in self._rows(values):
+            self._row_hashes.append(_row_hash(date_value, row_values))
+            shift = self._parse_row(row, date_value, row_values)
+            self._shifts_by_row.append(shift)
+            if shift:
+                self._index_person_cells(shift)
+        self._sort_shifts()
+        count(ROWS_PARSED, len(self._row_hashes))
+
+    def _update_task_names(self, values: list[list[str]]):
+        task_names = values[HEADERS_ROW_IDX][TASK_NAMES_IDX:] if values else []
+        self.task_indexes = index_strings(task_names)
+
+    @staticmethod
+    def _rows(values: list[list[str]]) -> Iterator[tuple[int, str, list[str]]]:
+        """Yield (sheet row, date, values) of the data rows, blank dates inherit the previous one"""
+        rows = values[DATA_ROW_IDX:]
+        dates = inherit_blank_dates([row[DATE_IDX] for row in rows])
+        for i, (date_value, row) in enumerate(zip(dates, rows)):
+            yield i + 2, date_value, row
+
+    def _parse_row(
+        self, row: int, date_value: str, row_values: list[str]
+    ) -> Shift | None:
+        log_sampled("parse_row", lambda: f"Parsing row {row} at {self.title}")
+        start, end = extract_and_convert_to_datetime(date_value, row_values[TIME_IDX])
+        if start is None:
+            logging.warning(f"Row {row} at {self.title} has no valid date")
+            return None
+        names = row_values[MEMBERS_IDX:]
+        return Shift(
+            row=row, start=start, end=end, names=names, codes=self._encode(names)
+        )
+
+    def _encode(self, names: list[str]) -> tuple[int, ...]:
+        codes = []
+        for name in names:
+            code = self._codes.get(name)
+            if code is None:
+                code = self._codes[name] = len(self.names)
+                self.names.append(name)
+            codes.append(code)
+        return tuple(codes)
+
+    def _own_cells(self, name: str) -> list[tuple[int, int, int]]:
+        """The cell list of the person, copied first if it is shared"""
+        cells = self._cells_by_name.get(name, [])
+        if name not in self._own_cell_lists:
+            cells = self._cells_by_name[name] = list(cells)
+            self._own_cell_lists.add(name)
+        return cells
+
+    def _index_person_cells(self, shift: Shift):
+        for j, name in enumerate(shift.names):
+            if name:
+                self._own_cells(name).append((self.index, shift.row, j + MEMBERS_IDX))
+
+    def _unindex_person_cells(self, shift: Shift):
+        for name in set(shift.names):
+            if cells := self._cells_by_name.get(name):
+                cells = [cell for cell in cells if cell[1] != shift.row]
+                if cells:
+                    self._cells_by_name[name] = cells
+                    self._own_cell_lists.add(name)
+                else:
+                    del self._cells_by_name[name]
+                    self._own_cell_lists.discard(name)
+
+    def _sort_shifts(self):
+        self._shifts = sorted(
+            filter(None, self._shifts_by_row), key=lambda s: (s.start, s.row)
+        )
+        self._starts = [shift.start for shift in self._shifts]
+        self.max_duration = max(
+            (shift.end - shift.start for shift in self._shifts), default=timedelta(0)
+        )
+
+    def _remove_shift(self, shift: Shift):
+        self._unindex_person_cells(shift)
+        i = bisect_left(self._starts, shift.start)
+        while self._shifts[i] is not shift:
+            i += 1
+        del self._shifts[i]
+        del self._starts[i]
+
+    def _insert_shift(self, shift: Shift):
+        self._index_person_cells(shift)
+        i = bisect_right(self._starts, shift.start)
+        while (
+            i > 0
+            and self._starts[i - 1] == shift.start
+            and self._shifts[i - 1].row > shift.row
+        ):
+            i -= 1
+        self._shifts.insert(i, shift)
+        self._starts.insert(i, shift.start)
+        # max duration only bounds the queries, so it is not shrunk on removals
+        self.max_duration = max(self.max_duration, shift.end - shift.start)
+
+    def _copy(self) -> "ShiftIndex":
+        shift_index = object.__new__(ShiftIndex)
+        shift_index.title = self.title
+        shift_index.index = self.index
+        shift_index.version = self.version
+        shift_index.task_indexes = self.task_indexes
+        shift_index.names = list(self.names)
+        shift_index._codes = dict(self._codes)
+        shift_index.max_duration = self.max_duration
+        shift_index._shifts = list(self._shifts)
+        shift_index._starts = list(self._starts)
+        shift_index._shifts_by_row = list(self._shifts_by_row)
+        shift_index._row_hashes = list(self._row_hashes)
+        # the cell lists are copied on the first change, by `_own_cells`
+        shift_index._cells_by_name = dict(self._cells_by_name)
+        shift_index._own_cell_lists = set()
+        return shift_index
+
+    def refresh(
+        self, index: int, values: list[list[str]], version: int
+    ) -> tuple["ShiftIndex", int]:
+        """
+        Build the index of a new tab snapshot, leaving this index untouched.
+        Rows are compared by content hash and only changed rows are parsed and
+        updated in a copy of the start index and of their persons' cell lists.
+        :return: the new index and the number of changed rows
+        """
+        if index != self.index:
+            shift_index = ShiftIndex(self.title, index, values, version)
+            return shift_index, len(shift_index._row_hashes)
+
+        shift_index = self._copy()
+        return shift_index, shift_index._apply(values, version)
+
+    def _apply(self, values: list[list[str]], version: int) -> int:
+        self.version = version
+        self._update_task_names(values)
+        changed = 0
+        rows = 0
+        for position, (row, date_value, row_values) in enumerate(self._rows(values)):
+            rows += 1
+            row_hash = _row_hash(date_value, row_values)
+            if position == len(self._row_hashes):
+                self._row_hashes.append(None)
+                self._shifts_by_row.append(None)
+            if self._row_hashes[position] != row_hash:
+                self._row_hashes[position] = row_hash
+                shift = self._parse_row(row, date_value, row_values)
+                self._replace_row(position, shift)
+                changed += 1
+
+        # rows removed from the end of the tab
+        for position in range(rows, len(self._row_hashes)):
+            self._replace_row(position, None)
+            changed += 1
+        del self._row_hashes[rows:]
+        del self._shifts_by_row[rows:]
+        count(ROWS_PARSED, changed)
+        return changed
+
+    def _replace_row(self, position: int, shift: Shift | None):
+        if old_shift := self._shifts_by_row[position]:
+            self._remove_shift(old_shift)
+        self._shifts_by_row[position] = shift
+        if shift:
+            self._insert_shift(shift)
+
+    def __len__(self):
+        return len(self._shifts)
+
+    def assignments(
+        self, shift: Shift, name: str = None
+    ) -> Iterator[tuple[str, list[int]]]:
+        """
+        Tasks of the shift that have members (and the person, if given)
+        :return: task name and the member positions of each task
+        """
+        person_code = self._codes.get(name) if name is not None else None
+        if name is not None and not person_code:
+            return
+
+        codes = shift.codes
+        for task_name, task_idx in self.task_indexes.items():
+            positions = [j for j in task_idx if j < len(codes) and codes[j]]
+            if positions and (
+                person_code is None or any(codes[j] == person_code for j in positions)
+            ):
+                yield task_name, positions
+
+    def cells_of(self, name: str) -> list[tuple[int, int, int]]:
+        """All (sheet_index, row, col) cells assigned to the person"""
+        return self._cells_by_name.get(name, [])
+
+    def _person_shifts(self, name: str) -> list[Shift]:
+        rows = dict.fromkeys(row for _, row, _ in self.cells_of(name))
+        shifts = [self._shifts_by_row[row - 2] for row in rows]
+        return sorted(shifts, key=lambda s: (s.start, s.row))
+
+    def _starting_between(self, start: datetime, end: datetime) -> list[Shift]:
+        lo = bisect_left(self._starts, start)
+        hi = bisect_right(self._starts, end)
+        return self._shifts[lo:hi]
+
+    def _earliest_start(self, start: datetime) -> datetime:
+        if start - datetime.min <= self.max_duration:
+            return datetime.min
+        return start - self.max_duration
+
+    def _candidates(self, start: datetime, end: datetime, name: str = None):
+        if name is not None:
+            return self._person_shifts(name)
+        return self._starting_between(self._earliest_start(start), end)
+
+    def at(self, moment: datetime, name: str = None) -> list[Shift]:
+        """All shifts (of the person, if given) that take place at the given moment"""
+        candidates = self._candidates(moment, moment, name)
+        return [shift for shift in candidates if shift.end >= moment >= shift.start]
+
+    def between(self, start: datetime, end: datetime, name: str = None) -> list[Shift]:
+        """All shifts (of the person, if given) that start or end in the given time range"""
+        candidates = self._candidates(start, end, name)
+        return [
+            shift
+            for shift in candidates
+            if end >= shift.end >= start or end >= shift.start >= start
+        ]
+
+
+def _row_hash(date_value: str, row_values: list[str]) -> int:
+    return hash((date_value, *row_values[TIME_IDX:]))
+
+
+class ReleaseTimeline:
+    """Release windows of the releases tab sorted by start time"""
+
+    def __init__(self, values: list[list[str]], version=0):
+        self.version = version
+        self.max_duration = timedelta(0)
+        self._windows: list[Shift] = []
+        rows = values[DATA_ROW_IDX:]
+        times = convert_date_time_columns(
+            [row[DATE_IDX] for row in rows], [row[TIME_IDX] for row in rows]
+        )
+        count(ROWS_PARSED, len(rows))
+        for i, (row, (start, end)) in enumerate(zip(rows, times)):
+            if start is None:
+                logging.warning(f"Release row {i + 2} has no valid date")
+                continue
+
+            names = [name for name in row[MEMBERS_IDX:] if name]
+            self._windows.append(Shift(row=i + 2, start=start, end=end, names=names))
+            self.max_duration = max(self.max_duration, end - start)
+
+        self._windows.sort(key=lambda w: (w.start, w.row))
+        self._starts = [window.start for window in self._windows]
+        self._boundaries = sorted(
+            {window.start for window in self._windows}
+            | {window.end for window in self._windows}
+        )
+
+    def released_at(self, moment: datetime) -> list[str]:
+        """Names released at the moment, by the first matching window in the tab"""
+        earliest = (
+            moment - self.max_duration
+            if moment - datetime.min > self.max_duration
+            else datetime.min
+        )
+        lo = bisect_left(self._starts, earliest)
+        hi = bisect_left(self._starts, moment)
+        windows = [w for w in self._windows[lo:hi] if w.end > moment]
+        if not windows:
+            return []
+        return list(min(windows, key=lambda w: w.row).names)
+
+    def next_boundary(self, moment: datetime) -> datetime | None:
+        """The first window start or end after the moment"""
+        i = bisect_right(self._boundaries, moment)
+        return self._boundaries[i] if i < len(self._boundaries) else None
+
+
+_shift_indexes: dict[str, ShiftIndex] = {}
+_shift_indexes_lock = threading.Lock()
+
+
+def get_shift_index(tab: TabSnapshot) -> ShiftIndex:
+    """Get the shift index of the tab, parsed once per tab snapshot version"""
+    with _shift_indexes_lock:
+        shift_index = _shift_indexes.get(tab.title)
+        if not shift_index:
+            shift_index = ShiftIndex(tab.title, tab.index, tab.values, tab.version)
+            _shift_indexes[tab.title] = shift_index
+        elif shift_index.version != tab.version:
+            shift_index, changed = shift_index.refresh(
+                tab.index, tab.values, tab.version
+            )
+            _shift_indexes[tab.title] = shift_index
+            logging.info(f"Refreshed {changed} changed rows at {tab.title}")
+        return shift_index
+
+
+_release_timeline = ReleaseTimeline([])
+
+
+def get_release_timeline(tab: TabSnapshot) -> ReleaseTimeline:
+    """Get the release timeline of the tab, compiled once per tab snapshot version"""
+    global _release_timeline
+    if _release_timeline.version != tab.version:
+        _release_timeline = ReleaseTimeline(tab.values, tab.version)
+    return _release_timeline
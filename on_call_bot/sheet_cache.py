@@ -0,0 +1,186 @@
+import itertools
+import logging
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable
+
+from gspread.exceptions import WorksheetNotFound
+
+from on_call_bot.configuration import SHEET_CACHE_TTL_SECS
+from on_call_bot.single_flight import SingleFlight
+
+
+@dataclass(slots=True)
+class TabSnapshot:
+    title: str
+    index: int
+    values: list[list[str]]
+    version: int
+    # generation of the tab when its load started, see SheetCache.invalidate
+    generation: int = 0
+    fetched_at: float = field(default_factory=time.monotonic)
+
+
+class SheetCache:
+    """In memory snapshot of the spreadsheet tabs, shared by all sheet reads"""
+
+    def __init__(self, ttl: float = SHEET_CACHE_TTL_SECS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._snapshots: dict[str, TabSnapshot] = {}
+        self._versions = itertools.count(1)
+        self._generations: dict[str, int] = {}
+        self._invalidations = itertools.count(1)
+        self._loads = SingleFlight()
+
+    def _is_fresh(self, snapshot: TabSnapshot) -> bool:
+        return time.monotonic() - snapshot.fetched_at < self.ttl
+
+    def get(self, title: str) -> TabSnapshot | None:
+        snapshot = self._snapshots.get(title)
+        if snapshot and self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        return None
+
+    def get_by_index(self, index: int) -> TabSnapshot | None:
+        for snapshot in self._snapshots.values():
+            if snapshot.index == index and self._is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+
+        self.misses += 1
+        return None
+
+    def generation(self, title: str) -> int:
+        """Number of the last invalidation of the tab"""
+        return self._generations.get(title, 0)
+
+    def put(
+        self,
+        title: str,
+        index: int,
+        values: list[list[str]],
+        generation: int = None,
+    ) -> TabSnapshot:
+        """
+        Store the tab values, keeping the same version when the content did not change.
+        Values loaded before the last invalidation of the tab (an older `generation`)
+        are stored already expired.
+        """
+        current = self.generation(title)
+        generation = current if generation is None else generation
+        fetched_at = time.monotonic() if generation >= current else float("-inf")
+        old = self._snapshots.get(title)
+        if old and old.index == index and old.values == values:
+            old.fetched_at = fetched_at
+            old.generation = max(old.generation, generation)
+            return old
+
+        snapshot = TabSnapshot(
+            title=title,
+            index=index,
+            values=values,
+            version=next(self._versions),
+            generation=generation,
+            fetched_at=fetched_at,
+        )
+        self._snapshots[title] = snapshot
+        return snapshot
+
+    def get_or_load(
+        self, title: str, loader: Callable[[], tuple[int, list[list[str]]]]
+    ) -> TabSnapshot:
+        """
+        Get tab snapshot from cache or load it from the sheet on miss
+        :param title: tab name
+        :param loader: callable returning the tab index and its values
+        :return: fresh tab snapshot
+        """
+        snapshots = self.get_or_load_many([title], lambda _: {title: loader()})
+        if title not in snapshots:
+            raise WorksheetNotFound(title)
+        return snapshots[title]
+
+    def get_or_load_many(
+        self,
+        titles: list[str],
+        loader: Callable[[list[str]], dict[str, tuple[int, list[list[str]]]]],
+    ) -> dict[str, TabSnapshot]:
+        """
+        Get tab snapshots from cache and load all missing tabs with a single loader call.
+        Tabs that are already being loaded by another thread are not loaded again,
+        their snapshots are taken from that load.
+        :param titles: tab names
+        :param loader: callable returning the index and values of each of the given tabs
+        :return: fresh tab snapshots by tab name, tabs the loader did not return are left out
+        """
+        snapshots = {}
+        missing = []
+        for title in dict.fromkeys(titles):
+            if snapshot := self.get(title):
+                snapshots[title] = snapshot
+            else:
+                missing.append(title)
+        if not missing:
+            return snapshots
+
+        owned, waiting = self._loads.claim(missing)
+        if owned:
+            snapshots.update(self._load(owned, loader))
+
+        for title, future in waiting.items():
+            try:
+                snapshots[title] = future.result()
+            except WorksheetNotFound:
+                continue
+        return snapshots
+
+    def _load(
+        self,
+        owned: dict[str, Future],
+        loader: Callable[[list[str]], dict[str, tuple[int, list[list[str]]]]],
+    ) -> dict[str, TabSnapshot]:
+        """Load the claimed tabs and resolve their waiting callers"""
+        generations = {title: self.generation(title) for title in owned}
+        try:
+            loaded = {
+                title: self.put(title, index, values, generations.get(title))
+                for title, (index, values) in loader(list(owned)).items()
+            }
+        except BaseException as e:
+            self._loads.resolve(owned, error=e)
+            raise
+
+        self._loads.resolve(
+            {title: f for title, f in owned.items() if title in loaded}, loaded
+        )
+        for title in owned.keys() - loaded.keys():
+            self._loads.resolve({title: owned[title]}, error=WorksheetNotFound(title))
+        logging.debug(f"Loaded {', '.join(loaded)} to sheet cache ({self.stats()})")
+        return loaded
+
+    def invalidate(self, *titles: str):
+        """
+        Expire given tabs (or all tabs when none given) in cache.
+        Loads of the tabs that are in flight are stored expired as well.
+        """
+        for title in titles or list(self._snapshots):
+            self._generations[title] = next(self._invalidations)
+            if snapshot := self._snapshots.get(title):
+                snapshot.fetched_at = float("-inf")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self._loads.shared,
+            "tabs": len(self._snapshots),
+        }
+
+
+sheet_cache = SheetCache()
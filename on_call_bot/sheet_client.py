@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+
+import gspread
+from gspread.exceptions import WorksheetNotFound
+
+from on_call_bot.configuration import (
+    SERVICE_ACCOUNT_JSON,
+    SHEET_URL,
+    WORKSHEETS_REFRESH_SECS,
+)
+from on_call_bot.quota import SheetQuota, sheet_quota
+from on_call_bot.request_context import count_sheet_call
+
+
+class WorksheetRegistry:
+    """
+    Worksheet handles of the spreadsheet by name, index and id.
+    Spreadsheet metadata is loaded once and refreshed only when a lookup misses
+    or when it is older than `refresh_secs`.
+    """
+
+    def __init__(
+        self, client: "SheetClient", refresh_secs: float = WORKSHEETS_REFRESH_SECS
+    ):
+        self.client = client
+        self.refresh_secs = refresh_secs
+        self.refreshes = 0
+        self._worksheets: dict[tuple[str, str | int], gspread.Worksheet] = {}
+        self._loaded_at = float("-inf")
+
+    def refresh(self):
+        count_sheet_call()
+        worksheets = {}
+        spreadsheet = self.client.spreadsheet
+        for worksheet in self.client.quota.read(spreadsheet.worksheets):
+            worksheets[("name", worksheet.title)] = worksheet
+            worksheets[("index", worksheet.index)] = worksheet
+            worksheets[("id", worksheet.id)] = worksheet
+        self._worksheets = worksheets
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def clear(self):
+        self._worksheets = {}
+        self._loaded_at = float("-inf")
+
+    def _is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at >= self.refresh_secs
+
+    def _lookup(self, key: tuple[str, str | int]) -> gspread.Worksheet:
+        if self._is_stale() or key not in self._worksheets:
+            self.refresh()
+
+        if key not in self._worksheets:
+            raise WorksheetNotFound(key[1])
+        return self._worksheets[key]
+
+    def by_name(self, name: str) -> gspread.Worksheet:
+        return self._lookup(("name", name))
+
+    def by_index(self, index: int) -> gspread.Worksheet:
+        return self._lookup(("index", index))
+
+    def by_id(self, worksheet_id: int) -> gspread.Worksheet:
+        return self._lookup(("id", worksheet_id))
+
+    def indexes(self) -> dict[str, int]:
+        """Index of every worksheet by its name"""
+        if self._is_stale():
+            self.refresh()
+        return {
+            key[1]: worksheet.index
+            for key, worksheet in self._worksheets.items()
+            if key[0] == "name"
+        }
+
+
+class SheetClient:
+    """Google spreadsheet connection, created on first use and reused after"""
+
+    def __init__(
+        self,
+        service_account_json: str = SERVICE_ACCOUNT_JSON,
+        sheet_url: str = SHEET_URL,
+        quota: SheetQuota = sheet_quota,
+    ):
+        self.service_account_json = service_account_json
+        self.sheet_url = sheet_url
+        self.quota = quota
+        self._client: gspread.Client | None = None
+        self._spreadsheet: gspread.Spreadsheet | None = None
+        self._lock = threading.Lock()
+        self.worksheets = WorksheetRegistry(self)
+
+    @property
+    def connected(self) -> bool:
+        return self._spreadsheet is not None
+
+    @property
+    def spreadsheet(self) -> gspread.Spreadsheet:
+        return self._spreadsheet or self.connect()
+
+    def connect(self) -> gspread.Spreadsheet:
+        with self._lock:
+            if self._spreadsheet is None:
+                count_sheet_call()
+                self._client = gspread.service_account(
+                    filename=self.service_account_json
+                )
+                self._spreadsheet = self.quota.read(
+                    self._client.open_by_url, self.sheet_url
+                )
+                logging.info(f"Connected to sheet {self._spreadsheet.title}")
+            return self._spreadsheet
+
+    def close(self):
+        with self._lock:
+            if self._client and self._client.session:
+                self._client.session.close()
+            self._client = None
+            self._spreadsheet = None
+        self.worksheets.clear()
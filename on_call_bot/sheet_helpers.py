@@ -1,31 +1,97 @@
 import logging
 from datetime import datetime
 
-import gspread
-
 from on_call_bot.configuration import (
     PERSONS_SHEET_NAME,
     RELEASES_SHEET_NAME,
-    SERVICE_ACCOUNT_JSON,
-    SHEET_URL,
+    SHEET_WRITE_JOURNAL,
+    SQLITE_PATH,
+    STORAGE_BACKEND,
+    TASKS_SHEET_NAMES,
     TEAMS_SHEET_NAME,
 )
 from on_call_bot.consts import (
     DATA_ROW_IDX,
     DATE_IDX,
     HEADERS_ROW_IDX,
-    MEMBERS_IDX,
-    TASK_NAMES_IDX,
     TIME_IDX,
 )
 from on_call_bot.globals import persons
+from on_call_bot.instrumentation import timed
 from on_call_bot.models import Person, Status, StatusName, Task
-from on_call_bot.utils import extract_and_convert_to_datetime, index_strings
+from on_call_bot.schedule import (
+    ReleaseTimeline,
+    get_release_timeline,
+    get_shift_index,
+)
+from on_call_bot.sheet_cache import TabSnapshot, sheet_cache
+from on_call_bot.sheet_client import SheetClient
+from on_call_bot.storage import (
+    GoogleSheetsBackend,
+    SQLiteBackend,
+    StorageBackend,
+    sync_storage,
+)
+from on_call_bot.utils import extract_and_convert_to_datetime
+from on_call_bot.write_queue import WriteBehindQueue
+
+sheet_client = SheetClient()
+sheet_storage = GoogleSheetsBackend(sheet_client)
+storage: StorageBackend = (
+    SQLiteBackend(SQLITE_PATH) if STORAGE_BACKEND == "sqlite" else sheet_storage
+)
+persons_writes = WriteBehindQueue(PERSONS_SHEET_NAME, SHEET_WRITE_JOURNAL)
+ALL_SHEET_NAMES = [
+    PERSONS_SHEET_NAME,
+    RELEASES_SHEET_NAME,
+    TEAMS_SHEET_NAME,
+    *TASKS_SHEET_NAMES,
+]
+
+
+def get_tab_index(tab_name: str) -> int:
+    # resolved on every load, so a moved tab gets its new index
+    return storage.tab_index(tab_name)
+
+
+def get_tab(tab_name: str) -> TabSnapshot:
+    """Get tab values from the shared sheet cache"""
+
+    def load():
+        return get_tab_index(tab_name), storage.read_tabs([tab_name])[tab_name]
+
+    return sheet_cache.get_or_load(tab_name, load)
+
+
+def fetch_tabs(tab_names: list[str]):
+    """Load all expired tabs into the sheet cache using a single batched request"""
+
+    def load(missing: list[str]) -> dict[str, tuple[int, list[list[str]]]]:
+        indexes = {name: get_tab_index(name) for name in missing}
+        return {
+            name: (indexes[name], values)
+            for name, values in storage.read_tabs(missing).items()
+        }
+
+    sheet_cache.get_or_load_many(tab_names, load)
+
+
+def get_tab_by_index(sheet_index: int) -> TabSnapshot:
+    if snapshot := sheet_cache.get_by_index(sheet_index):
+        return snapshot
+
+    return get_tab(storage.tab_name(sheet_index))
+
 
-gc = gspread.service_account(filename=SERVICE_ACCOUNT_JSON)
-sheet = gc.open_by_url(SHEET_URL)
+def get_row_date(values: list[list[str]], row_idx: int) -> str | None:
+    """Blank date cell inherit the date of the previous rows"""
+    for row in reversed(values[DATA_ROW_IDX : row_idx + 1]):
+        if row[DATE_IDX]:
+            return row[DATE_IDX]
+    return None
 
 
+@timed
 def get_tasks_from_sheet(
     tab_name: str,
     now: bool = True,
@@ -34,95 +100,73 @@ def get_tasks_from_sheet(
     end_in: datetime = None,
 ) -> list[Task]:
     tasks = []
-    tab = sheet.worksheet(tab_name)
-    tab_data = tab.get_all_values()
-    task_names = tab_data[HEADERS_ROW_IDX][TASK_NAMES_IDX:]
-    start_date = start_from or datetime.now()
-    end_date = end_in or datetime.max
-    prev_date_value = None
-    for i, row in enumerate(tab_data[DATA_ROW_IDX:]):
-        logging.info(f"Parsing row {i} at {tab_name}")
-        date_value = row[DATE_IDX]
-        time_value = row[TIME_IDX]
-        names = row[MEMBERS_IDX:]
-        if not date_value:
-            date_value = prev_date_value
-        else:
-            prev_date_value = date_value
-
-        start_task, end_task = extract_and_convert_to_datetime(date_value, time_value)
-        is_now = now and end_task >= datetime.now() >= start_task
-        is_between_dates = not now and (
-            (end_date >= end_task >= start_date)
-            or (end_date >= start_task >= start_date)
+    tab = get_tab(tab_name)
+    shift_index = get_shift_index(tab)
+    person_name = person.name if person else None
+    if now:
+        shifts = shift_index.at(datetime.now(), person_name)
+    else:
+        shifts = shift_index.between(
+            start_from or datetime.now(), end_in or datetime.max, person_name
         )
-        is_on_date = is_now or is_between_dates
-        is_person = (person and person.name in names) or (not person)
-
-        if is_person and is_on_date:
-            task_indexes = index_strings(task_names)
-            for task_name, task_idx in task_indexes.items():
-                members = []
-                cols = []
-                for j in task_idx:
-                    name = names[j]
-                    if name:
-                        if memeber_person := persons.get(name):
-                            members.append(memeber_person)
-                            cols.append(j + 2)
-                        else:
-                            logging.warning(f"{name} does not found in list")
-
-                task = Task(
+
+    for shift in shifts:
+        for task_name, positions in shift_index.assignments(shift, person_name):
+            members = []
+            cols = []
+            for j in positions:
+                name = shift.names[j]
+                if memeber_person := persons.get(name):
+                    members.append(memeber_person)
+                    cols.append(j + 2)
+                else:
+                    logging.warning(f"{name} does not found in list")
+            if not members:
+                continue
+
+            tasks.append(
+                Task.model_construct(
                     task_name=task_name,
                     sheet=tab_name,
                     sheet_index=tab.index,
-                    row=i + 2,
+                    row=shift.row,
                     cols=cols,
-                    start=start_task,
-                    end=end_task,
+                    start=shift.start,
+                    end=shift.end,
                     members=members,
                 )
-                task_member_names = [person.name for person in task.members]
-                if (
-                    person and person.name not in task_member_names
-                ) or not task_member_names:
-                    continue
-
-                tasks.append(task)
+            )
 
     return tasks
 
 
-def get_released_members():
-    tab = sheet.worksheet(RELEASES_SHEET_NAME)
-    tab_data = tab.get_all_values()
-    released_persons = []
-    for i, row in enumerate(tab_data[DATA_ROW_IDX:]):
-        logging.info(f"Parsing row {i} at {RELEASES_SHEET_NAME}")
-        date_value = row[DATE_IDX]
-        time_value = row[TIME_IDX]
-        start_time, end_time = extract_and_convert_to_datetime(date_value, time_value)
+def get_releases_timeline() -> ReleaseTimeline:
+    return get_release_timeline(get_tab(RELEASES_SHEET_NAME))
 
-        if start_time < datetime.now() < end_time:
-            return [name for name in row[MEMBERS_IDX:] if name]
 
-    return released_persons
+@timed
+def get_released_members() -> list[str]:
+    return get_releases_timeline().released_at(datetime.now())
 
 
+@timed
 def get_teams_and_persons():
     persons = {}
     teams = {}
 
+    fetch_tabs([TEAMS_SHEET_NAME, PERSONS_SHEET_NAME])
+
     # get teams
-    tab = sheet.worksheet(TEAMS_SHEET_NAME)
-    tab_data = tab.get_all_values()
+    tab_data = get_tab(TEAMS_SHEET_NAME).values
     team_names = tab_data[0]
     for i, team_name in enumerate(team_names):
         teams[team_name] = [row[i] for row in tab_data[1:] if row[i]]
+    team_of = {
+        name: team_name for team_name, members in teams.items() for name in members
+    }
 
-    tab = sheet.worksheet(PERSONS_SHEET_NAME)
-    tab_data = tab.get_all_values()[1:]
+    persons_tab = get_tab(PERSONS_SHEET_NAME)
+    tab_data = persons_writes.overlay(persons_tab.values, persons_tab.generation)[1:]
     names = [data[0] for data in tab_data]
     phones = [data[1] for data in tab_data]
     emails = [data[4] for data in tab_data]
@@ -139,22 +183,21 @@ def get_teams_and_persons():
                 status_update_time[i] or datetime.now().isoformat()
             )
 
-        person_team = None
-        for team_name, team_members in teams.items():
-            if name in team_members:
-                person_team = team_name
+        person_team = team_of.get(name)
         if not person_team:
             logging.warning(f"{name} has no team")
             continue
 
-        person = Person(
+        # sheet values are already typed here, so models are built without validation
+        person = Person.model_construct(
             row=i + 2,
             name=name,
             phone=phones[i],
             email=emails[i],
             team=person_team,
-            status=Status(
-                status_name=person_status or StatusName.here, update_time=status_time
+            status=Status.model_construct(
+                status_name=StatusName(person_status or StatusName.here),
+                update_time=status_time,
             ),
         )
         persons[name] = person
@@ -166,23 +209,24 @@ def get_teams_and_persons():
     return teams, persons
 
 
+@timed
 def get_task_by_cell(
     sheet_index: int, row: int, cols: list[int], person: Person = None
 ) -> Task | None:
     task = None
-    tab = sheet.get_worksheet(sheet_index)
-    values = tab.get_values(combine_merged_cells=True)
+    tab = get_tab_by_index(sheet_index)
+    values = tab.values
     row_data = values[row - 1]
     for c in cols:
         name = row_data[c]
         if person and person.name == name:
             task_name = values[HEADERS_ROW_IDX][c]
-            date_value = row_data[DATE_IDX]
+            date_value = get_row_date(values, row - 1)
             time_value = row_data[TIME_IDX]
             start_task, end_task = extract_and_convert_to_datetime(
                 date_value, time_value
             )
-            task = Task(
+            task = Task.model_construct(
                 task_name=task_name,
                 start=start_task,
                 end=end_task,
@@ -190,73 +234,128 @@ def get_task_by_cell(
                 sheet_index=tab.index,
                 row=row,
                 cols=[c],
-                member=[person],
+                members=[person],
             )
     return task
 
 
 def get_replacers(sheet_index: str, row: str, cols: str):
-    tab = sheet.get_worksheet(int(sheet_index))
+    values = get_tab_by_index(int(sheet_index)).values
     cols = cols.split("_")
     replacers = []
+    next_row = int(row)
     for c in cols:
-        name = tab.cell(int(row) + 1, int(c) + 1).value
+        name = None
+        if next_row < len(values) and int(c) < len(values[next_row]):
+            name = values[next_row][int(c)] or None
         replacers.append(name)
     return replacers
 
 
 def update_person_sheet_status(row: int, status: Status):
-    tab = sheet.worksheet(PERSONS_SHEET_NAME)
-    worksheet = sheet.get_worksheet_by_id(tab.id)
-    worksheet.update_cell(row, 6, status.status_name.value)
-    worksheet.update_cell(row, 7, status.update_time.isoformat())
+    persons_writes.put(row, 6, status.status_name.value)
+    persons_writes.put(row, 7, status.update_time.isoformat())
 
 
 def update_person_chat_id_sheet(person: Person, chat_id: int):
-    tab = sheet.worksheet(PERSONS_SHEET_NAME)
-    worksheet = sheet.get_worksheet_by_id(tab.id)
-    worksheet.update_cell(person.row, 8, chat_id)
+    persons_writes.put(person.row, 8, chat_id)
+
+
+@timed
+def flush_persons_writes() -> int:
+    """Flush queued person writes to the sheet as a single batch update"""
+    if not len(persons_writes):
+        return 0
+
+    def invalidate_persons() -> int:
+        sheet_cache.invalidate(PERSONS_SHEET_NAME)
+        return sheet_cache.generation(PERSONS_SHEET_NAME)
+
+    return persons_writes.flush(storage, on_flushed=invalidate_persons)
+
+
+@timed
+def sync_storage_with_sheet() -> list[str]:
+    """Two way sync of the local store with the Google sheet"""
+    if storage is sheet_storage:
+        return []
+
+    changed = sync_storage(storage, sheet_storage, ALL_SHEET_NAMES)
+    if changed:
+        logging.info(f"Synced {changed} from sheet")
+        sheet_cache.invalidate(*changed)
+    return changed
 
 
+def warm_up_sheet():
+    """Connect and load all tabs into the sheet cache ahead of the first request"""
+    if storage is sheet_storage:
+        sheet_client.connect()
+    else:
+        try:
+            sync_storage_with_sheet()
+        except Exception as e:
+            logging.exception(f"Starting from local store, sync failed due to {str(e)}")
+    fetch_tabs(ALL_SHEET_NAMES)
+
+
+def find_person_col(row_values: list[str], cols: list[int], name: str) -> int | None:
+    """Find the (1-based) column of the name among the given (0-based) columns"""
+    person_col = None
+    for c in cols:
+        if c < len(row_values) and row_values[c] == name:
+            person_col = c + 1
+    return person_col
+
+
+@timed
 def switch_shifts_sheet(
     requester_person: Person,
     first_shift_data: str,
     requested_person: Person,
     second_shift_data: str,
 ) -> str:
-    second_sheet_index, srow, scols = second_shift_data.split("_", maxsplit=2)
-    scols = [int(c) for c in scols.split("_")]
-    sworksheet = sheet.get_worksheet(int(second_sheet_index))
-    scol = None
-    for c in scols:
-        if requested_person.name == sworksheet.cell(srow, c + 1).value:
-            scol = c + 1
-
-    if not scol:
-        logging.error(f"{requested_person.name} not found at [{srow}, {scols}]")
-        raise ValueError(f"{requested_person.name} not found at [{srow}, {scols}]")
-
+    """
+    Swap shifts with a single batched read and a single batched write.
+    Both names are verified right before the write so a shift that was changed
+    in between fails the whole swap instead of half applying it.
+    """
+    shifts = [(requested_person, requester_person, second_shift_data)]
     if first_shift_data:
-        first_sheet_index, frow, fcols = first_shift_data.split("_", maxsplit=2)
-        fworksheet = sheet.get_worksheet(int(first_sheet_index))
-        fcols = [int(c) for c in fcols.split("_")]
-        fcol = None
-        for c in fcols:
-            if requester_person.name == sworksheet.cell(int(frow), c + 1).value:
-                fcol = c + 1
-
-        if fcol is None:
-            logging.error(f"{requester_person.name} not found at [{fcol}, {fcols}]")
-            raise ValueError(f"{requester_person.name} not found at [{fcol}, {fcols}]")
-
-        logging.info(
-            f"Replacing [{frow}, {fcol}]: {fworksheet.cell(int(frow), int(fcol)).value} with {requested_person.name}"
+        shifts.append((requester_person, requested_person, first_shift_data))
+
+    cells = []
+    for _, _, shift_data in shifts:
+        sheet_index, row, cols = shift_data.split("_", maxsplit=2)
+        cells.append(
+            (
+                storage.tab_name(int(sheet_index)),
+                int(row),
+                [int(c) for c in cols.split("_")],
+            )
         )
-        fworksheet.update_cell(int(frow), int(fcol), requested_person.name)
+
+    rows = storage.read_rows([(title, row) for title, row, _ in cells])
+    updates = []
+    log_lines = []
+    for (current_person, new_person, _), (title, row, cols), row_values in zip(
+        shifts, cells, rows
+    ):
+        col = find_person_col(row_values, cols, current_person.name)
+        if col is None:
+            logging.error(f"{current_person.name} not found at [{row}, {cols}]")
+            raise ValueError(f"{current_person.name} not found at [{row}, {cols}]")
+
+        updates.append((title, row, col, new_person.name))
+        log_lines.append(
+            f"Replacing [{row}, {col}]: {current_person.name} with {new_person.name}"
+        )
+
     msg = (
         f"{requester_person.name} replace shift with {requested_person.name} \n"
-        f"Replacing [{srow}, {scol}]: {sworksheet.cell(int(srow), int(scol)).value} with {requester_person.name}"
+        + "\n".join(log_lines)
     )
     logging.info(msg)
-    sworksheet.update_cell(int(srow), int(scol), requester_person.name)
+    storage.write_cells(updates)
+    sheet_cache.invalidate(*[title for title, _, _ in cells])
     return msg
@@ -0,0 +1,40 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+
+from on_call_bot.configuration import (
+    SHEET_CALL_TIMEOUT_SECS,
+    SHEET_IO_WORKERS,
+    SHEET_MAX_IN_FLIGHT,
+)
+
+T = TypeVar("T")
+
+sheet_executor = ThreadPoolExecutor(
+    max_workers=SHEET_IO_WORKERS, thread_name_prefix="sheet-io"
+)
+in_flight = asyncio.Semaphore(SHEET_MAX_IN_FLIGHT)
+
+
+async def run_sheet_call(
+    func: Callable[..., T], *args, timeout: float = SHEET_CALL_TIMEOUT_SECS, **kwargs
+) -> T:
+    """
+    Run a blocking sheet call on the sheet I/O thread pool so the event loop
+    keeps serving other chats meanwhile.
+    :param func: blocking function to run
+    :param timeout: seconds to wait for a free slot and for the call to finish
+    :return: the function result
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+
+    async def call():
+        async with in_flight:
+            return await loop.run_in_executor(
+                sheet_executor, context.run, partial(func, *args, **kwargs)
+            )
+
+    return await asyncio.wait_for(call(), timeout)
@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+from typing import Hashable, Iterable
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent loads of the same resource: the first caller of a key
+    runs the load, callers arriving while it is in flight wait for its result.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(
+        self, keys: Iterable[Hashable]
+    ) -> tuple[dict[Hashable, Future], dict[Hashable, Future]]:
+        """
+        Claim the keys that are not in flight
+        :return: futures of the claimed keys, to be resolved by the caller,
+            and futures of the keys already in flight
+        """
+        owned = {}
+        waiting = {}
+        with self._lock:
+            for key in keys:
+                if key in self._in_flight:
+                    waiting[key] = self._in_flight[key]
+                    self.shared += 1
+                else:
+                    owned[key] = self._in_flight[key] = Future()
+        return owned, waiting
+
+    def resolve(
+        self,
+        owned: dict[Hashable, Future],
+        results: dict[Hashable, object] = None,
+        error: BaseException = None,
+    ):
+        """Release the claimed keys, passing their results (or error) to the waiting callers"""
+        with self._lock:
+            for key in owned:
+                self._in_flight.pop(key, None)
+
+        for key, future in owned.items():
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result((results or {}).get(key))
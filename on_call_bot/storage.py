@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import absolute_range_name, fill_gaps, rowcol_to_a1
+
+from on_call_bot.request_context import count_sheet_call
+from on_call_bot.sheet_client import SheetClient
+
+# tab name, 1-based row, 1-based col, value
+CellUpdate = tuple[str, int, int, str]
+
+
+class StorageBackend(ABC):
+    """Storage of the spreadsheet tabs, cells are addressed by tab name and 1-based row/col"""
+
+    @abstractmethod
+    def tab_indexes(self) -> dict[str, int]:
+        """Index of every tab by its name"""
+
+    def tab_index(self, name: str) -> int:
+        indexes = self.tab_indexes()
+        if name not in indexes:
+            raise WorksheetNotFound(name)
+        return indexes[name]
+
+    def tab_name(self, index: int) -> str:
+        for name, tab_index in self.tab_indexes().items():
+            if tab_index == index:
+                return name
+        raise WorksheetNotFound(index)
+
+    @abstractmethod
+    def read_tabs(self, tab_names: list[str]) -> dict[str, list[list[str]]]:
+        """All values of the given tabs"""
+
+    @abstractmethod
+    def read_rows(self, rows: list[tuple[str, int]]) -> list[list[str]]:
+        """Values of the given (tab name, row) rows"""
+
+    @abstractmethod
+    def write_cells(self, updates: list[CellUpdate]):
+        """Write all the given cells at once"""
+
+
+class GoogleSheetsBackend(StorageBackend):
+    def __init__(self, client: SheetClient):
+        self.client = client
+
+    @property
+    def spreadsheet(self):
+        return self.client.spreadsheet
+
+    def tab_indexes(self) -> dict[str, int]:
+        return self.client.worksheets.indexes()
+
+    def tab_index(self, name: str) -> int:
+        # refreshes the worksheets metadata when the tab is not known yet
+        return self.client.worksheets.by_name(name).index
+
+    def tab_name(self, index: int) -> str:
+        return self.client.worksheets.by_index(index).title
+
+    def read_tabs(self, tab_names: list[str]) -> dict[str, list[list[str]]]:
+        count_sheet_call()
+        response = self.client.quota.read(
+            self.spreadsheet.values_batch_get,
+            [absolute_range_name(name) for name in tab_names],
+        )
+        return {
+            name: fill_gaps(value_range.get("values", []))
+            for name, value_range in zip(tab_names, response["valueRanges"])
+        }
+
+    def read_rows(self, rows: list[tuple[str, int]]) -> list[list[str]]:
+        count_sheet_call()
+        response = self.client.quota.read(
+            self.spreadsheet.values_batch_get,
+            [absolute_range_name(name, f"{row}:{row}") for name, row in rows],
+        )
+        return [
+            (value_range.get("values") or [[]])[0]
+            for value_range in response["valueRanges"]
+        ]
+
+    def write_cells(self, updates: list[CellUpdate]):
+        if not updates:
+            return
+
+        data = []
+        for (name, row), first_col, row_values in contiguous_ranges(updates):
+            cells_range = (
+                f"{rowcol_to_a1(row, first_col)}:"
+                f"{rowcol_to_a1(row, first_col + len(row_values) - 1)}"
+            )
+            data.append(
+                {
+                    "range": absolute_range_name(name, cells_range),
+                    "values": [row_values],
+                }
+            )
+        count_sheet_call()
+        self.client.quota.write(
+            self.spreadsheet.values_batch_update,
+            body={"valueInputOption": "USER_ENTERED", "data": data},
+        )
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Local copy of the spreadsheet tabs. Cells written by the bot are marked
+    dirty until they are pushed to the sheet by `sync_storage`.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tabs (name TEXT PRIMARY KEY, idx INTEGER)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cells ("
+                "tab TEXT, row INTEGER, col INTEGER, value TEXT, dirty INTEGER DEFAULT 0, "
+                "PRIMARY KEY (tab, row, col))"
+            )
+
+    def close(self):
+        self._db.close()
+
+    def tab_indexes(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._db.execute("SELECT name, idx FROM tabs"))
+
+    def read_tabs(self, tab_names: list[str]) -> dict[str, list[list[str]]]:
+        with self._lock:
+            return {name: self._read_tab(name) for name in tab_names}
+
+    def _read_tab(self, name: str) -> list[list[str]]:
+        cells = self._db.execute(
+            "SELECT row, col, value FROM cells WHERE tab = ? ORDER BY row, col", (name,)
+        ).fetchall()
+        values = [[] for _ in range(max((row for row, _, _ in cells), default=0))]
+        for row, col, value in cells:
+            row_values = values[row - 1]
+            row_values.extend([""] * (col - len(row_values)))
+            row_values[col - 1] = value
+        return fill_gaps(values)
+
+    def read_rows(self, rows: list[tuple[str, int]]) -> list[list[str]]:
+        result = []
+        with self._lock:
+            for name, row in rows:
+                row_values = []
+                for col, value in self._db.execute(
+                    "SELECT col, value FROM cells WHERE tab = ? AND row = ? ORDER BY col",
+                    (name, row),
+                ):
+                    row_values.extend([""] * (col - len(row_values)))
+                    row_values[col - 1] = value
+                result.append(row_values)
+        return result
+
+    def write_cells(self, updates: list[CellUpdate], dirty: bool = True):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cells (tab, row, col, value, dirty) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (name, row, col, str(value), int(dirty))
+                    for name, row, col, value in updates
+                ],
+            )
+
+    def dirty_cells(self) -> list[CellUpdate]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT tab, row, col, value FROM cells WHERE dirty = 1"
+            ).fetchall()
+
+    def mark_clean(self, updates: list[CellUpdate]):
+        """Mark pushed cells clean, unless they were written again meanwhile"""
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE cells SET dirty = 0 WHERE tab = ? AND row = ? AND col = ? AND value = ?",
+                updates,
+            )
+
+    def replace_tab(self, name: str, index: int, values: list[list[str]]) -> bool:
+        """
+        Replace the tab values with the sheet values, keeping the dirty cells
+        :return: whether the tab content changed
+        """
+        with self._lock, self._db:
+            changed = self._read_tab(name) != fill_gaps(values)
+            self._db.execute("INSERT OR REPLACE INTO tabs VALUES (?, ?)", (name, index))
+            if changed:
+                self._db.execute(
+                    "DELETE FROM cells WHERE tab = ? AND dirty = 0", (name,)
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO cells (tab, row, col, value) VALUES (?, ?, ?, ?)",
+                    [
+                        (name, i + 1, j + 1, value)
+                        for i, row in enumerate(values)
+                        for j, value in enumerate(row)
+                        if value
+                    ],
+                )
+            return changed
+
+
+def contiguous_ranges(
+    updates: list[CellUpdate],
+) -> list[tuple[tuple[str, int], int, list]]:
+    """Group cell updates to ((tab name, row), first col, values) of adjacent cells"""
+    rows = defaultdict(dict)
+    for name, row, col, value in updates:
+        rows[(name, row)][col] = str(value)
+
+    ranges = []
+    for tab_row, cols in sorted(rows.items()):
+        row_ranges = []
+        for col in sorted(cols):
+            if row_ranges and row_ranges[-1][1] + len(row_ranges[-1][2]) == col:
+                row_ranges[-1][2].append(cols[col])
+            else:
+                row_ranges.append((tab_row, col, [cols[col]]))
+        ranges.extend(row_ranges)
+    return ranges
+
+
+def sync_storage(
+    local: SQLiteBackend, remote: StorageBackend, tab_names: list[str]
+) -> list[str]:
+    """
+    Two way sync of the local store with the sheet: local dirty cells are
+    pushed first, then the sheet tabs are pulled. On conflicts cells written
+    locally since the last sync win, any other cell takes the sheet value.
+    :return: names of the tabs whose local content changed
+    """
+    if dirty := local.dirty_cells():
+        remote.write_cells(dirty)
+        local.mark_clean(dirty)
+
+    indexes = remote.tab_indexes()
+    tab_names = [name for name in tab_names if name in indexes]
+    return [
+        name
+        for name, values in remote.read_tabs(tab_names).items()
+        if local.replace_tab(name, indexes[name], values)
+    ]
@@ -2,12 +2,14 @@ import urllib
 from collections import defaultdict
 from copy import deepcopy
 from datetime import datetime, timedelta
+from functools import lru_cache
 from re import Match
 
 import pytz
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from on_call_bot import translator
+from on_call_bot.configuration import DATE_PARSE_CACHE_SIZE
 from on_call_bot.consts import COMPILED_DATE_REGEX, COMPILED_TIME_RANGE_REGEX
 
 return_button = InlineKeyboardButton(
@@ -30,59 +32,53 @@ def parse_times(time_value: str) -> dict:
     :param time_value: time range value should looks like HH:mm-HH:mm
     :return: dict of start time and end time
     """
+    start_hrs, start_min, end_hrs, end_min = parse_time_range(time_value)
+    return {
+        "start": {
+            "hours": start_hrs,
+            "minutes": start_min,
+        },
+        "end": {
+            "hours": end_hrs,
+            "minutes": end_min,
+        },
+    }
+
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def parse_time_range(time_value: str) -> tuple[int, int, int, int]:
+    """Parse HH:mm-HH:mm into start hours, start minutes, end hours and end minutes"""
     if not time_value:
-        return {
-            "start": {
-                "hours": 0,
-                "minutes": 0,
-            },
-            "end": {
-                "hours": 23,
-                "minutes": 59,
-            },
-        }
-    parse_time_value = deepcopy(time_value)
+        return 0, 0, 23, 59
+
     # if time_value == "בוקר":
     #     parse_time_value = "07:00-22:00"
     # elif time_value == "לילה":
     #     parse_time_value = "22:00-07:00"
 
-    start_time, end_time = parse_time_value.split("-")
+    start_time, end_time = time_value.split("-")
     start_hrs, start_min = start_time.split(":")
     end_hrs, end_min = end_time.split(":")
-    return {
-        "start": {
-            "hours": int(start_hrs),
-            "minutes": int(start_min),
-        },
-        "end": {
-            "hours": int(end_hrs),
-            "minutes": int(end_min),
-        },
-    }
+    return int(start_hrs), int(start_min), int(end_hrs), int(end_min)
 
 
 def extract_and_convert_to_datetime(
     date_value, time_value
 ) -> tuple[datetime, datetime] | tuple[None, None]:
-    parsed_times = parse_times(time_value)
+    return _convert_date_time(date_value, time_value, datetime.today().year)
+
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def _convert_date_time(
+    date_value, time_value, default_year: int
+) -> tuple[datetime, datetime] | tuple[None, None]:
+    """Parse each distinct (date, time range) once, datetimes are immutable so results are shared"""
+    start_hrs, start_min, end_hrs, end_min = parse_time_range(time_value)
     # Convert the matched date string to a datetime object
     try:
-        formatted_date = parse_datetime(date_value)
-        start_time = datetime(
-            formatted_date.year,
-            formatted_date.month,
-            formatted_date.day,
-            parsed_times["start"]["hours"],
-            parsed_times["start"]["minutes"],
-        )
-        end_time = datetime(
-            formatted_date.year,
-            formatted_date.month,
-            formatted_date.day,
-            parsed_times["end"]["hours"],
-            parsed_times["end"]["minutes"],
-        )
+        formatted_date = _parse_date(date_value, default_year)
+        start_time = formatted_date.replace(hour=start_hrs, minute=start_min)
+        end_time = formatted_date.replace(hour=end_hrs, minute=end_min)
 
         # crossed day case
         if end_time < start_time:
@@ -94,6 +90,27 @@ def extract_and_convert_to_datetime(
         return None, None
 
 
+def inherit_blank_dates(date_column: list[str]) -> list[str]:
+    """Blank date cells inherit the date of the previous rows"""
+    dates = []
+    prev_date_value = None
+    for date_value in date_column:
+        prev_date_value = date_value or prev_date_value
+        dates.append(prev_date_value)
+    return dates
+
+
+def convert_date_time_columns(
+    date_column: list[str], time_column: list[str]
+) -> list[tuple[datetime, datetime] | tuple[None, None]]:
+    """Convert the date and time range columns of schedule rows in one pass"""
+    default_year = datetime.today().year
+    return [
+        _convert_date_time(date_value, time_value, default_year)
+        for date_value, time_value in zip(inherit_blank_dates(date_column), time_column)
+    ]
+
+
 def get_datetime_from_match(datetime_match: Match) -> datetime:
     hours = datetime_match.group("hours") or "00"
     minutes = datetime_match.group("minutes") or "00"
@@ -183,9 +200,15 @@ def get_year(year_match) -> int:
 
 
 def parse_datetime(date_value: str) -> datetime:
+    return _parse_date(date_value, datetime.today().year)
+
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def _parse_date(date_value: str, default_year: int) -> datetime:
     match = COMPILED_DATE_REGEX.search(date_value)
+    year = match.group("year")
     return datetime(
         day=int(match.group("day")),
         month=int(match.group("month")),
-        year=get_year(match.group("year")),
+        year=get_year(year) if year else default_year,
     )
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+from on_call_bot.storage import StorageBackend
+
+
+class WriteBehindQueue:
+    """
+    Pending cell writes of a single tab, merged per row and flushed together
+    with one batched write. Every write is appended to a local journal
+    so pending writes survive a restart until they are flushed.
+    Flushed writes stay in the overlay until a tab snapshot loaded after the
+    write is read, so reads during and right after a flush do not see the old values.
+    """
+
+    def __init__(self, tab_name: str, journal_path: str | None = None):
+        self.tab_name = tab_name
+        self.journal_path = journal_path
+        self.last_flush_ms: float | None = None
+        self._pending: dict[int, dict[int, str]] = {}
+        self._flushing: dict[int, dict[int, str]] = {}
+        # flushed writes, by the tab generation that includes them
+        self._written: list[tuple[int, dict[int, dict[int, str]]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._load_journal()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _load_journal(self):
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, "r") as journal:
+            for line in journal:
+                if line.strip():
+                    write = json.loads(line)
+                    self._merge(write["row"], write["col"], write["value"])
+        logging.info(f"Loaded {len(self)} pending {self.tab_name} rows from journal")
+
+    def _merge(self, row: int, col: int, value: str):
+        self._pending.setdefault(row, {})[col] = value
+
+    def _rewrite_journal(self):
+        if not self.journal_path:
+            return
+
+        with open(self.journal_path, "w") as journal:
+            for row, cols in self._pending.items():
+                for col, value in cols.items():
+                    journal.write(json.dumps({"row": row, "col": col, "value": value}))
+                    journal.write("\n")
+
+    def put(self, row: int, col: int, value):
+        """Queue a write of `value` to the (1-based) cell at row, col"""
+        value = str(value)
+        with self._lock:
+            self._merge(row, col, value)
+            if self.journal_path:
+                with open(self.journal_path, "a") as journal:
+                    journal.write(json.dumps({"row": row, "col": col, "value": value}))
+                    journal.write("\n")
+
+    def overlay(
+        self, values: list[list[str]], generation: int = None
+    ) -> list[list[str]]:
+        """
+        Return tab values with the pending writes applied on top of them
+        :param generation: generation of the tab snapshot, flushed writes that
+            a snapshot of this generation already includes are not applied (and dropped)
+        """
+        with self._lock:
+            if generation is not None:
+                self._written = [
+                    (written_generation, writes)
+                    for written_generation, writes in self._written
+                    if written_generation > generation
+                ]
+            if not self._pending and not self._flushing and not self._written:
+                return values
+
+            values = list(values)
+            written = [writes for _, writes in self._written]
+            for writes in (*written, self._flushing, self._pending):
+                for row, cols in writes.items():
+                    if row > len(values):
+                        continue
+                    row_values = list(values[row - 1])
+                    for col, value in cols.items():
+                        row_values.extend([""] * (col - len(row_values)))
+                        row_values[col - 1] = value
+                    values[row - 1] = row_values
+            return values
+
+    def flush(
+        self, storage: StorageBackend, on_flushed: Callable[[], int] = None
+    ) -> int:
+        """
+        Write all pending rows to the storage with a single write
+        :param on_flushed: called after the write to invalidate the cached tab,
+            returns the tab generation that includes the write. The flushed rows
+            stay in the overlay of older snapshots
+        :return: number of flushed rows
+        """
+        with self._flush_lock:
+            return self._flush(storage, on_flushed)
+
+    def _flush(self, storage: StorageBackend, on_flushed: Callable[[], int]) -> int:
+        with self._lock:
+            pending = self._flushing = self._pending
+            self._pending = {}
+
+        if not pending:
+            return 0
+
+        updates = [
+            (self.tab_name, row, col, value)
+            for row, cols in pending.items()
+            for col, value in cols.items()
+        ]
+        start_time = time.perf_counter()
+        try:
+            storage.write_cells(updates)
+        except Exception:
+            with self._lock:
+                for row, cols in pending.items():
+                    for col, value in cols.items():
+                        self._pending.setdefault(row, {}).setdefault(col, value)
+                self._flushing = {}
+            raise
+
+        self.last_flush_ms = (time.perf_counter() - start_time) * 1000
+        try:
+            if on_flushed and (generation := on_flushed()) is not None:
+                self._written.append((generation, pending))
+        finally:
+            with self._lock:
+                self._flushing = {}
+                self._rewrite_journal()
+        logging.info(
+            f"Flushed {len(pending)} rows to {self.tab_name} in {self.last_flush_ms:.0f} ms"
+        )
+        return len(pending)
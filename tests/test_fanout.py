@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+from on_call_bot.fanout import FanOut
+
+
+class FakeBot:
+    def __init__(self, errors: dict = None):
+        self.errors = errors or {}
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+@pytest.mark.asyncio
+async def test_fanout_sends_to_every_chat_once():
+    bot = FakeBot()
+    deliveries = await FanOut(messages_per_sec=1000).send(bot, [1, 2, 3, 2], "hi")
+
+    assert [(d.chat_id, d.delivered, d.attempts) for d in deliveries] == [
+        (1, True, 1),
+        (2, True, 1),
+        (3, True, 1),
+    ]
+    assert sorted(chat_id for chat_id, _, _ in bot.sent) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_fanout_respects_global_rate():
+    bot = FakeBot()
+    start = time.monotonic()
+    await FanOut(messages_per_sec=20).send(bot, list(range(30)), "hi")
+    # a burst of 20 messages, then the other 10 at 20 messages per second
+    assert time.monotonic() - start >= 0.45
+
+
+@pytest.mark.asyncio
+async def test_fanout_retries_and_reports_failures():
+    bot = FakeBot(
+        {
+            1: [RetryAfter(0), TimedOut()],
+            2: [BadRequest("Chat not found")],
+            3: [TimedOut()] * 5,
+        }
+    )
+    fanout = FanOut(
+        messages_per_sec=1000, chat_interval=0, max_retries=2, backoff_base=0
+    )
+    first, second, third = await fanout.send(bot, [1, 2, 3], "hi")
+
+    assert (first.delivered, first.attempts, first.error) == (True, 3, None)
+    assert (second.delivered, second.attempts, second.error) == (
+        False,
+        1,
+        "Chat not found",
+    )
+    assert (first.rejected, second.rejected, third.rejected) == (False, True, False)
+    assert (third.delivered, third.attempts) == (False, 3)
+
+
+@pytest.mark.asyncio
+async def test_fanout_spaces_messages_to_the_same_chat():
+    bot = FakeBot()
+    fanout = FanOut(messages_per_sec=1000, chat_interval=0.2)
+    await fanout.send(bot, [1], "first")
+    await fanout.send(bot, [1], "second")
+    (_, _, first_at), (_, _, second_at) = bot.sent
+    assert second_at - first_at >= 0.19
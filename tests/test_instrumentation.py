@@ -0,0 +1,44 @@
+import logging
+
+from on_call_bot.instrumentation import (
+    ROWS_PARSED,
+    SHEET_CALLS,
+    count,
+    log_sampled,
+    process_metrics,
+    timed,
+)
+from on_call_bot.request_context import count_sheet_call, request_scope
+from on_call_bot.schedule import ShiftIndex
+
+
+@timed
+def parse_tab():
+    return ShiftIndex("tasks", 0, [["date", "time", "Gate"], ["10.3.24", "", "Alice"]])
+
+
+def test_metrics_per_update_and_process():
+    rows_before = process_metrics.counters[ROWS_PARSED]
+    with request_scope("update") as request:
+        parse_tab()
+        count_sheet_call()
+        count(ROWS_PARSED, 2)
+
+    assert request.metrics.counters == {ROWS_PARSED: 3, SHEET_CALLS: 1}
+    assert list(request.metrics.timings) == ["parse_tab"]
+    assert request.summary().startswith(
+        "update: 3 rows parsed, 1 sheet calls (parse_tab "
+    )
+    assert process_metrics.counters[ROWS_PARSED] == rows_before + 3
+
+
+def test_log_sampled(caplog):
+    with caplog.at_level(logging.DEBUG):
+        for i in range(7):
+            log_sampled("test_event", lambda: f"event {i}", every=3)
+
+    assert [record.message for record in caplog.records] == [
+        "event 0 (1 times)",
+        "event 3 (4 times)",
+        "event 6 (7 times)",
+    ]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+from on_call_bot.fanout import FanOut
+from on_call_bot.outbox import MessagePriority, Outbox
+
+
+class FakeBot:
+    def __init__(self, fail_chats: set = None, down_for: int = 0):
+        self.fail_chats = fail_chats or set()
+        self.down_for = down_for
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.down_for:
+            self.down_for -= 1
+            raise RuntimeError("This HTTPXRequest is not initialized!")
+        if chat_id in self.fail_chats:
+            raise BadRequest("Chat not found")
+        self.sent.append((chat_id, text, kwargs.get("reply_markup")))
+
+
+def fast_sender():
+    return FanOut(messages_per_sec=1000, chat_interval=0, backoff_base=0)
+
+
+@pytest.mark.asyncio
+async def test_outbox_sends_by_priority():
+    outbox = Outbox(sender=fast_sender())
+    outbox.put("dev_channel", "log 1", MessagePriority.log)
+    outbox.put(1, "alert", MessagePriority.alert)
+    outbox.put("dev_channel", "log 2", MessagePriority.log)
+    outbox.put(2, "reply", MessagePriority.reply)
+    outbox.put(None, "no channel", MessagePriority.log)
+    bot = FakeBot()
+
+    outbox.start(bot, workers=1)
+    await outbox.join()
+    await outbox.stop()
+
+    assert [text for _, text, _ in bot.sent] == ["reply", "alert", "log 1", "log 2"]
+    assert outbox.stats() == {"sent": 4, "failed": 0, "pending": 0}
+
+
+@pytest.mark.asyncio
+async def test_outbox_survives_restart(tmp_path):
+    journal_path = str(tmp_path / "outbox.journal")
+    reply_markup = InlineKeyboardMarkup(
+        [[InlineKeyboardButton("back", callback_data="back")]]
+    )
+    outbox = Outbox(journal_path, sender=fast_sender())
+    outbox.put(1, "reply", MessagePriority.reply, reply_markup=reply_markup)
+    outbox.put(2, "log", MessagePriority.log)
+
+    restarted_outbox = Outbox(journal_path, sender=fast_sender())
+    assert len(restarted_outbox) == 2
+    restarted_outbox.put(3, "alert", MessagePriority.alert)
+    bot = FakeBot(fail_chats={2})
+    restarted_outbox.start(bot, workers=1)
+    await restarted_outbox.join()
+    await restarted_outbox.stop()
+
+    assert bot.sent == [(1, "reply", reply_markup), (3, "alert", None)]
+    assert restarted_outbox.stats() == {"sent": 2, "failed": 1, "pending": 0}
+    assert len(Outbox(journal_path)) == 0
+
+
+@pytest.mark.asyncio
+async def test_outbox_retries_unsent_messages(tmp_path):
+    journal_path = str(tmp_path / "outbox.journal")
+    outbox = Outbox(journal_path, sender=fast_sender(), retry_secs=0)
+    outbox.put(1, "reply", MessagePriority.reply)
+    bot = FakeBot(down_for=2)
+
+    outbox.start(bot, workers=1)
+    await outbox.join()
+    await outbox.stop()
+
+    assert bot.sent == [(1, "reply", None)]
+    assert outbox.stats() == {"sent": 1, "failed": 0, "pending": 0}
+
+
+@pytest.mark.asyncio
+async def test_outbox_keeps_unsent_messages_on_stop(tmp_path):
+    journal_path = str(tmp_path / "outbox.journal")
+    outbox = Outbox(journal_path, sender=fast_sender(), retry_secs=60)
+    outbox.put(1, "reply", MessagePriority.reply)
+    outbox.put(2, "log", MessagePriority.log)
+
+    outbox.start(FakeBot(down_for=100))
+    await asyncio.sleep(0.1)
+    await outbox.stop()
+
+    assert outbox.stats()["sent"] == 0
+    assert len(Outbox(journal_path)) == 2
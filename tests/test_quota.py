@@ -0,0 +1,87 @@
+import pytest
+
+from on_call_bot.fake_sheets import quota_error
+from on_call_bot.quota import Priority, SheetQuota, TokenBucket, current_priority
+
+
+def test_token_bucket_keeps_reserve_for_interactive_calls():
+    bucket = TokenBucket(rate_per_minute=10, reserve=0.5)
+    for _ in range(5):
+        assert bucket.try_acquire(Priority.background) == 0
+    assert bucket.try_acquire(Priority.background) > 0
+
+    for _ in range(5):
+        assert bucket.try_acquire(Priority.interactive) == 0
+    assert bucket.try_acquire(Priority.interactive) > 0
+
+
+@pytest.mark.parametrize(
+    "errors, expected_retried",
+    [
+        ([], 0),
+        ([quota_error(429)], 1),
+        ([quota_error(500), quota_error(429)], 2),
+    ],
+)
+def test_sheet_quota_retries(errors, expected_retried):
+    quota = SheetQuota(backoff_base=0)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert quota.read(call) == "ok"
+    assert quota.stats() == {"throttled": 0, "retried": expected_retried}
+
+
+def test_sheet_quota_does_not_retry_client_errors():
+    quota = SheetQuota(backoff_base=0)
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise quota_error(400)
+
+    with pytest.raises(Exception):
+        quota.write(call)
+    assert len(calls) == 1
+    assert quota.retried == 0
+
+
+@pytest.mark.parametrize(
+    "priority, expected_retried",
+    [(Priority.interactive, 2), (Priority.background, 5)],
+)
+def test_sheet_quota_retries_interactive_calls_within_timeout(
+    monkeypatch, priority, expected_retried
+):
+    clock = [0.0]
+    monkeypatch.setattr("on_call_bot.quota.time.monotonic", lambda: clock[0])
+    monkeypatch.setattr(
+        "on_call_bot.quota.time.sleep",
+        lambda secs: clock.__setitem__(0, clock[0] + secs),
+    )
+    quota = SheetQuota(interactive_timeout=2.5)
+    monkeypatch.setattr(quota, "backoff", lambda attempt: 1)
+
+    def call():
+        raise quota_error(429)
+
+    token = current_priority.set(priority)
+    try:
+        with pytest.raises(Exception):
+            quota.read(call)
+    finally:
+        current_priority.reset(token)
+    assert quota.retried == expected_retried
+
+
+def test_sheet_quota_counts_throttled_calls():
+    quota = SheetQuota(reads_per_minute=6000, interactive_reserve=0)
+    quota.read(lambda: None)
+    assert quota.throttled == 0
+
+    quota.reads._tokens = 0
+    quota.read(lambda: None)
+    assert quota.throttled == 1
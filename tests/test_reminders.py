@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from on_call_bot import core
+from on_call_bot.models import Person, Status, StatusName
+from on_call_bot.reminders import ReminderScheduler
+
+NOW = datetime(2024, 3, 10, 7, 0)
+HOUR = timedelta(hours=1)
+
+
+def test_reminders_pop_due_in_order_and_repeat():
+    reminders = ReminderScheduler()
+    reminders.schedule(1, 2 * HOUR, first=NOW + 2 * HOUR)
+    reminders.schedule(2, 4 * HOUR, first=NOW + HOUR)
+    reminders.schedule(3, HOUR, first=NOW + 3 * HOUR)
+
+    assert reminders.pop_due(NOW) == []
+    assert reminders.next_due() == NOW + HOUR
+    assert reminders.pop_due(NOW + 2 * HOUR) == [2, 1]
+    assert reminders.pop_due(NOW + 4 * HOUR) == [3, 1]
+    # missed reminders are due once
+    assert reminders.pop_due(NOW + 10 * HOUR) == [2, 3, 1]
+    assert reminders.next_due() == NOW + 11 * HOUR
+
+
+def test_reminders_reschedule_and_cancel():
+    reminders = ReminderScheduler()
+    reminders.schedule(1, HOUR, first=NOW + HOUR)
+    reminders.schedule(2, HOUR, first=NOW + HOUR)
+    reminders.schedule(1, 4 * HOUR, first=NOW + 4 * HOUR)
+    reminders.cancel(2)
+    reminders.cancel(3)
+
+    assert len(reminders) == 1
+    assert 2 not in reminders
+    assert reminders.pop_due(NOW + 3 * HOUR) == []
+    assert reminders.pop_due(NOW + 4 * HOUR) == [1]
+
+
+def test_reminders_compact_stale_entries():
+    reminders = ReminderScheduler()
+    for _ in range(1000):
+        reminders.schedule(1, HOUR, first=NOW + HOUR)
+    assert len(reminders._heap) < 100
+    assert reminders.pop_due(NOW + HOUR) == [1]
+
+
+def test_reminders_snapshot_and_restore():
+    reminders = ReminderScheduler()
+    reminders.schedule(1, HOUR, first=NOW + HOUR)
+    reminders.schedule(2, 2 * HOUR, first=NOW)
+    reminders.cancel(1)
+
+    restored = ReminderScheduler()
+    restored.schedule(3, HOUR)
+    restored.restore(reminders.snapshot())
+
+    assert restored.snapshot() == {2: (NOW, 2 * HOUR)}
+    assert restored.pop_due(NOW) == [2]
+    assert restored.next_due() == NOW + 2 * HOUR
+
+
+def test_restore_reminders_of_out_persons(monkeypatch):
+    def person(chat_id: int, status_name: StatusName) -> Person:
+        return Person.model_construct(
+            name=str(chat_id),
+            chat_id=chat_id,
+            status=Status(status_name=status_name, update_time=datetime.now()),
+        )
+
+    monkeypatch.setattr(core, "reminders", ReminderScheduler())
+    monkeypatch.setattr(
+        core,
+        "persons_by_chat_id",
+        {
+            1: person(1, StatusName.out),
+            2: person(2, StatusName.short_out),
+            3: person(3, StatusName.here),
+            4: person(4, StatusName.out),
+        },
+    )
+    long_out = timedelta(hours=core.REMIND_LONG_OUT_HRS)
+    short_out = timedelta(hours=core.REMIND_SHORT_OUT_HRS)
+    core.restore_reminders({1: (NOW, long_out), 3: (NOW, long_out), 4: (NOW, HOUR)})
+
+    snapshot = core.reminders.snapshot()
+    assert sorted(snapshot) == [1, 2, 4]
+    assert snapshot[1] == (NOW, long_out)
+    assert snapshot[2][1] == short_out and snapshot[2][0] > datetime.now()
+    assert snapshot[4][1] == long_out and snapshot[4][0] > datetime.now()
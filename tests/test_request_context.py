@@ -0,0 +1,46 @@
+import pytest
+
+from on_call_bot.request_context import (
+    count_sheet_call,
+    current_request,
+    invalidate,
+    memoize,
+    memoize_async,
+    request_scope,
+    request_scoped,
+)
+from on_call_bot.sheet_io import run_sheet_call
+
+
+def test_memoize_within_request():
+    computed = []
+
+    def compute():
+        computed.append(1)
+        return len(computed)
+
+    assert memoize("key", compute) == 1
+    assert memoize("key", compute) == 2
+    with request_scope("test"):
+        assert memoize("key", compute) == 3
+        assert memoize("key", compute) == 3
+        invalidate("key")
+        assert memoize("key", compute) == 4
+    assert current_request.get() is None
+
+
+@pytest.mark.asyncio
+async def test_sheet_calls_counted_per_update():
+    async def compute():
+        return await run_sheet_call(count_sheet_call)
+
+    @request_scoped
+    async def handler(update, context):
+        await memoize_async("tasks", compute)
+        await memoize_async("tasks", compute)
+        await run_sheet_call(count_sheet_call)
+        return current_request.get()
+
+    request = await handler(None, None)
+    assert request.name == "handler"
+    assert request.sheet_calls == 2
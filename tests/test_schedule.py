@@ -0,0 +1,211 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from on_call_bot import schedule
+from on_call_bot.schedule import ReleaseTimeline, ShiftIndex, get_shift_index
+from on_call_bot.sheet_cache import TabSnapshot
+
+TAB_VALUES = [
+    ["date", "time", "Gate", "Gate", "Patrol"],
+    ["10.3.24", "07:00-15:00", "Alice", "Bob", "Carol"],
+    ["", "15:00-23:00", "Dave", "", "Alice"],
+    ["", "23:00-07:00", "Bob", "Carol", ""],
+    ["11.3.24", "07:00-15:00", "Alice", "Dave", "Bob"],
+]
+
+
+@pytest.fixture
+def shift_index():
+    return ShiftIndex("tasks", 0, TAB_VALUES)
+
+
+@pytest.mark.parametrize(
+    "moment, expected_rows",
+    [
+        (datetime(2024, 3, 10, 8, 0), [2]),
+        (datetime(2024, 3, 10, 15, 0), [2, 3]),
+        (datetime(2024, 3, 11, 2, 0), [4]),
+        (datetime(2024, 3, 11, 7, 0), [4, 5]),
+        (datetime(2024, 3, 12, 7, 0), []),
+    ],
+)
+def test_shift_index_at(shift_index, moment, expected_rows):
+    assert [shift.row for shift in shift_index.at(moment)] == expected_rows
+
+
+@pytest.mark.parametrize(
+    "start, end, expected_rows",
+    [
+        (datetime(2024, 3, 10), datetime(2024, 3, 11), [2, 3, 4]),
+        (datetime(2024, 3, 11, 6, 0), datetime(2024, 3, 11, 8, 0), [4, 5]),
+        (datetime(2024, 3, 10, 9, 0), datetime(2024, 3, 10, 10, 0), []),
+    ],
+)
+def test_shift_index_between(shift_index, start, end, expected_rows):
+    assert [shift.row for shift in shift_index.between(start, end)] == expected_rows
+
+
+def test_shift_index_inherits_blank_dates(shift_index):
+    assert len(shift_index) == 4
+    assert shift_index.task_indexes == {"Gate": [0, 1], "Patrol": [2]}
+
+
+def test_shift_index_person_cells(shift_index):
+    assert shift_index.cells_of("Alice") == [(0, 2, 2), (0, 3, 4), (0, 5, 2)]
+    assert shift_index.cells_of("Nobody") == []
+    assert [
+        shift.row for shift in shift_index.at(datetime(2024, 3, 10, 16), "Alice")
+    ] == [3]
+    assert [
+        shift.row
+        for shift in shift_index.between(
+            datetime(2024, 3, 10), datetime(2024, 3, 12), "Carol"
+        )
+    ] == [2, 4]
+
+
+def test_shift_index_assignments(shift_index):
+    first, second = shift_index.at(datetime(2024, 3, 10, 15, 0))
+    assert list(shift_index.assignments(first)) == [("Gate", [0, 1]), ("Patrol", [2])]
+    assert list(shift_index.assignments(second)) == [("Gate", [0]), ("Patrol", [2])]
+    assert list(shift_index.assignments(first, "Carol")) == [("Patrol", [2])]
+    assert list(shift_index.assignments(first, "Nobody")) == []
+    assert shift_index.names[first.codes[0]] == "Alice"
+
+
+def test_shift_index_refresh_updates_changed_rows(shift_index):
+    values = [list(row) for row in TAB_VALUES]
+    values[2][4] = "Erin"
+    values.pop()
+    refreshed, changed = shift_index.refresh(0, values, version=2)
+    assert changed == 2
+
+    assert refreshed.version == 2
+    assert refreshed.cells_of("Alice") == [(0, 2, 2)]
+    assert refreshed.cells_of("Erin") == [(0, 3, 4)]
+    assert len(refreshed) == 3
+    # the cells of persons on unchanged rows are shared, not copied
+    assert refreshed.cells_of("Carol") is shift_index.cells_of("Carol")
+    # the shared index is left as it was
+    assert shift_index.version == 0
+    assert shift_index.cells_of("Alice") == [(0, 2, 2), (0, 3, 4), (0, 5, 2)]
+    assert len(shift_index) == 4
+
+
+def test_shift_index_refresh_appends_rows(shift_index):
+    values = TAB_VALUES + [["", "15:00-23:00", "Erin", "", "Carol"]]
+    refreshed, changed = shift_index.refresh(0, values, version=2)
+    assert changed == 1
+
+    assert [shift.row for shift in refreshed.at(datetime(2024, 3, 11, 16))] == [6]
+    assert refreshed.cells_of("Carol") == [(0, 2, 4), (0, 4, 3), (0, 6, 4)]
+    assert shift_index.cells_of("Carol") == [(0, 2, 4), (0, 4, 3)]
+
+
+def test_shift_index_refresh_reparses_inheriting_rows(shift_index):
+    values = [list(row) for row in TAB_VALUES]
+    values[1][0] = "12.3.24"
+    shift_index, changed = shift_index.refresh(0, values, version=2)
+    assert changed == 3
+    shift_index, changed = shift_index.refresh(0, values, version=3)
+    assert changed == 0
+
+    assert [
+        shift.row
+        for shift in shift_index.between(datetime(2024, 3, 11), datetime(2024, 3, 14))
+    ] == [5, 2, 3, 4]
+    assert shift_index.cells_of("Dave") == [(0, 5, 3), (0, 3, 2)]
+
+
+REFRESH_DAYS = [datetime(2024, 3, 10) + timedelta(days=i) for i in range(100)]
+REFRESH_VALUES = [["date", "time", "Gate", "Patrol"]] + [
+    [f"{day.day}.{day.month}.24", "07:00-15:00", "Alice", "Bob"] for day in REFRESH_DAYS
+]
+# every other shift moved to the evening and to other persons
+REFRESHED_VALUES = [REFRESH_VALUES[0]] + [
+    row if i % 2 else [row[0], "15:00-23:00", "Carol", "Alice"]
+    for i, row in enumerate(REFRESH_VALUES[1:])
+]
+
+
+def query_refreshed(shift_index: ShiftIndex):
+    start, end = REFRESH_DAYS[0], REFRESH_DAYS[-1] + timedelta(days=1)
+    return (
+        [shift.row for shift in shift_index.between(start, end)],
+        [shift.row for shift in shift_index.between(start, end, "Alice")],
+        [shift.row for shift in shift_index.at(REFRESH_DAYS[10] + timedelta(hours=16))],
+    )
+
+
+def refresh_until(stop: threading.Event):
+    version = 0
+    while not stop.is_set():
+        version += 1
+        values = REFRESHED_VALUES if version % 2 else REFRESH_VALUES
+        get_shift_index(TabSnapshot("tasks", 0, values, version))
+
+
+def query_until(stop: threading.Event, expected: list, errors: list):
+    try:
+        while not stop.is_set():
+            shift_index = schedule._shift_indexes["tasks"]
+            assert query_refreshed(shift_index) == expected[shift_index.version % 2]
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+
+
+def test_shift_index_queries_while_refreshing(monkeypatch):
+    monkeypatch.setattr(schedule, "_shift_indexes", {})
+    expected = [
+        query_refreshed(ShiftIndex("tasks", 0, values))
+        for values in [REFRESH_VALUES, REFRESHED_VALUES]
+    ]
+    get_shift_index(TabSnapshot("tasks", 0, REFRESH_VALUES, 0))
+    stop = threading.Event()
+    errors = []
+
+    threads = [threading.Thread(target=refresh_until, args=(stop,))]
+    threads += [
+        threading.Thread(target=query_until, args=(stop, expected, errors))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    stop.wait(1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+RELEASES_VALUES = [
+    ["date", "time", "released", "released"],
+    ["10.3.24", "07:00-10:00", "Alice", "Bob"],
+    ["", "09:00-12:00", "Carol", ""],
+    ["11.3.24", "", "Dave", ""],
+]
+
+
+@pytest.mark.parametrize(
+    "moment, expected_names",
+    [
+        (datetime(2024, 3, 10, 8, 0), ["Alice", "Bob"]),
+        (datetime(2024, 3, 10, 9, 30), ["Alice", "Bob"]),
+        (datetime(2024, 3, 10, 10, 0), ["Carol"]),
+        (datetime(2024, 3, 10, 7, 0), []),
+        (datetime(2024, 3, 11, 15, 0), ["Dave"]),
+        (datetime(2024, 3, 12, 15, 0), []),
+    ],
+)
+def test_release_timeline_released_at(moment, expected_names):
+    assert ReleaseTimeline(RELEASES_VALUES).released_at(moment) == expected_names
+
+
+def test_release_timeline_next_boundary():
+    timeline = ReleaseTimeline(RELEASES_VALUES)
+    assert timeline.next_boundary(datetime(2024, 3, 10, 8)) == datetime(2024, 3, 10, 9)
+    assert timeline.next_boundary(datetime(2024, 3, 10, 9)) == datetime(2024, 3, 10, 10)
+    assert timeline.next_boundary(datetime(2024, 3, 11, 23, 59)) is None
@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from gspread.exceptions import WorksheetNotFound
+
+from on_call_bot.sheet_cache import SheetCache
+
+
+def test_sheet_cache_hit_and_miss():
+    cache = SheetCache(ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return 3, [["date", "time"]]
+
+    first = cache.get_or_load("tasks", loader)
+    second = cache.get_or_load("tasks", loader)
+    assert first is second
+    assert len(loads) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "shared": 0, "tabs": 1}
+    assert cache.get_by_index(3) is first
+
+
+def test_sheet_cache_invalidate_and_ttl():
+    cache = SheetCache(ttl=60)
+    snapshot = cache.put("persons", 0, [])
+    cache.invalidate("persons")
+    assert cache.get("persons") is None
+
+    same_snapshot = cache.put("persons", 0, [])
+    assert same_snapshot.version == snapshot.version
+    assert cache.get("persons") is same_snapshot
+
+    new_snapshot = cache.put("persons", 0, [["Alice"]])
+    assert new_snapshot.version > snapshot.version
+
+    expired_cache = SheetCache(ttl=0)
+    expired_cache.put("persons", 0, [])
+    assert expired_cache.get("persons") is None
+
+
+def test_sheet_cache_shares_concurrent_loads():
+    cache = SheetCache(ttl=60)
+    loads = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader(titles):
+        loads.append(titles)
+        started.set()
+        release.wait(5)
+        return {title: (i, [[title]]) for i, title in enumerate(titles)}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(cache.get_or_load_many, ["persons", "teams"], loader)
+        started.wait(5)
+        others = [
+            executor.submit(cache.get_or_load_many, ["teams", "tasks"], loader)
+            for _ in range(2)
+        ]
+        time.sleep(0.05)
+        release.set()
+        results = [first.result()] + [other.result() for other in others]
+
+    assert sorted(map(sorted, loads)) == [["persons", "teams"], ["tasks"]]
+    assert results[1]["teams"] is results[0]["teams"]
+    assert results[1]["tasks"] is results[2]["tasks"]
+    assert cache.stats()["shared"] == 3
+
+
+def test_sheet_cache_missing_tab_is_not_found_by_waiting_callers():
+    cache = SheetCache(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def loader(titles):
+        started.set()
+        release.wait(5)
+        return {"persons": (0, [["persons"]])}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(cache.get_or_load_many, ["persons", "gone"], loader)
+        started.wait(5)
+        waiting = executor.submit(cache.get_or_load, "gone", lambda: (1, []))
+        time.sleep(0.05)
+        release.set()
+
+        assert list(first.result()) == ["persons"]
+        with pytest.raises(WorksheetNotFound):
+            waiting.result()
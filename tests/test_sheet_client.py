@@ -0,0 +1,61 @@
+import pytest
+from gspread.exceptions import WorksheetNotFound
+
+from on_call_bot.sheet_client import SheetClient, WorksheetRegistry
+
+
+class StubWorksheet:
+    def __init__(self, title: str, index: int):
+        self.title = title
+        self.index = index
+        self.id = 1000 + index
+
+
+class StubSpreadsheet:
+    def __init__(self, titles: list[str]):
+        self.titles = titles
+        self.metadata_calls = 0
+
+    def worksheets(self):
+        self.metadata_calls += 1
+        return [StubWorksheet(title, i) for i, title in enumerate(self.titles)]
+
+
+@pytest.fixture
+def spreadsheet():
+    return StubSpreadsheet(["persons", "teams", "tasks"])
+
+
+@pytest.fixture
+def registry(spreadsheet):
+    client = SheetClient()
+    client._spreadsheet = spreadsheet
+    return WorksheetRegistry(client, refresh_secs=60)
+
+
+def test_worksheet_registry_loads_metadata_once(registry, spreadsheet):
+    assert registry.by_name("tasks").index == 2
+    assert registry.by_index(1).title == "teams"
+    assert registry.by_id(1000).title == "persons"
+    assert registry.indexes() == {"persons": 0, "teams": 1, "tasks": 2}
+    assert spreadsheet.metadata_calls == 1
+
+
+def test_worksheet_registry_refresh_on_miss(registry, spreadsheet):
+    registry.by_name("persons")
+    spreadsheet.titles.append("releases")
+    assert registry.by_name("releases").index == 3
+    assert spreadsheet.metadata_calls == 2
+
+    with pytest.raises(WorksheetNotFound):
+        registry.by_name("missing")
+    assert spreadsheet.metadata_calls == 3
+
+
+def test_worksheet_registry_refresh_on_schedule(spreadsheet):
+    client = SheetClient()
+    client._spreadsheet = spreadsheet
+    registry = WorksheetRegistry(client, refresh_secs=0)
+    registry.by_name("persons")
+    registry.by_name("persons")
+    assert spreadsheet.metadata_calls == 2
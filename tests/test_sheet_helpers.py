@@ -0,0 +1,232 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from on_call_bot import schedule, sheet_helpers
+from on_call_bot.configuration import (
+    PERSONS_SHEET_NAME,
+    RELEASES_SHEET_NAME,
+    TASKS_SHEET_NAMES,
+    TEAMS_SHEET_NAME,
+)
+from on_call_bot.fake_sheets import FakeSpreadsheet
+from on_call_bot.globals import persons
+from on_call_bot.models import Status, StatusName
+from on_call_bot.quota import SheetQuota
+from on_call_bot.request_context import request_scope
+from on_call_bot.sheet_cache import SheetCache
+from on_call_bot.sheet_client import SheetClient
+from on_call_bot.storage import GoogleSheetsBackend
+from on_call_bot.write_queue import WriteBehindQueue
+
+NAMES = ["Alice", "Bob", "Carol", "Dave"]
+
+
+def make_tabs() -> dict[str, list[list[str]]]:
+    yesterday = datetime.now() - timedelta(days=1)
+    tasks = [["date", "time", "Gate", "Gate", "Patrol"]]
+    for day in range(3):
+        date_value = (yesterday + timedelta(days=day)).strftime("%d.%m.%y")
+        tasks.append([date_value, "00:00-12:00", "Alice", "Bob", "Carol"])
+        tasks.append(["", "12:00-00:00", "Dave", "", "Alice"])
+
+    status_time = datetime.now().isoformat()
+    return {
+        PERSONS_SHEET_NAME: [
+            ["name", "phone", "rank", "address", "email", "status", "time", "chat"]
+        ]
+        + [
+            [name, f"05{i}", "", "", "", StatusName.here.value, status_time, ""]
+            for i, name in enumerate(NAMES)
+        ],
+        TEAMS_SHEET_NAME: [["A", "B"], ["Alice", "Carol"], ["Bob", "Dave"]],
+        RELEASES_SHEET_NAME: [["date", "time", "released"]],
+        TASKS_SHEET_NAMES[0]: tasks,
+    }
+
+
+@pytest.fixture
+def spreadsheet(monkeypatch):
+    spreadsheet = FakeSpreadsheet(make_tabs())
+    client = SheetClient(quota=SheetQuota(max_retries=2, backoff_base=0))
+    client._spreadsheet = spreadsheet
+    backend = GoogleSheetsBackend(client)
+    monkeypatch.setattr(sheet_helpers, "sheet_client", client)
+    monkeypatch.setattr(sheet_helpers, "sheet_storage", backend)
+    monkeypatch.setattr(sheet_helpers, "storage", backend)
+    monkeypatch.setattr(sheet_helpers, "sheet_cache", SheetCache(ttl=60))
+    monkeypatch.setattr(
+        sheet_helpers, "persons_writes", WriteBehindQueue(PERSONS_SHEET_NAME)
+    )
+    monkeypatch.setattr(schedule, "_shift_indexes", {})
+    yield spreadsheet
+    persons.clear()
+
+
+@pytest.fixture
+def warm_spreadsheet(spreadsheet):
+    sheet_helpers.warm_up_sheet()
+    persons.update(sheet_helpers.get_teams_and_persons()[1])
+    spreadsheet.reset_calls()
+    return spreadsheet
+
+
+def test_warm_up_loads_all_tabs_with_two_calls(spreadsheet):
+    with request_scope("warm_up") as request:
+        sheet_helpers.warm_up_sheet()
+
+    assert request.sheet_calls == 2
+    assert spreadsheet.calls == {"worksheets": 1, "values_batch_get": 1}
+
+
+def test_read_flows_are_served_from_cache(warm_spreadsheet):
+    with request_scope("read") as request:
+        teams, loaded_persons = sheet_helpers.get_teams_and_persons()
+        tasks = sheet_helpers.get_tasks_from_sheet(TASKS_SHEET_NAMES[0])
+        released = sheet_helpers.get_released_members()
+
+    assert request.sheet_calls == 0
+    assert warm_spreadsheet.total_calls == 0
+    assert teams == {"A": ["Alice", "Bob"], "B": ["Carol", "Dave"]}
+    assert list(loaded_persons) == NAMES
+    assert {task.task_name for task in tasks} == {"Gate", "Patrol"}
+    assert released == []
+
+
+def test_status_updates_are_flushed_in_one_call(warm_spreadsheet):
+    now = datetime.now()
+    with request_scope("status") as request:
+        sheet_helpers.update_person_sheet_status(
+            2, Status(status_name=StatusName.out, update_time=now)
+        )
+        sheet_helpers.update_person_chat_id_sheet(persons["Bob"], 777)
+        assert sheet_helpers.flush_persons_writes() == 2
+
+    assert request.sheet_calls == 1
+    assert warm_spreadsheet.calls == {"values_batch_update": 1}
+    worksheet = warm_spreadsheet.worksheet(PERSONS_SHEET_NAME)
+    assert worksheet.get_values("A2:H2")[0][5:] == [
+        StatusName.out.value,
+        now.isoformat(),
+    ]
+    assert worksheet.cell(3, 8).value == "777"
+
+
+def test_persons_load_during_flush_is_not_cached_stale(warm_spreadsheet, monkeypatch):
+    storage = sheet_helpers.storage
+    read_tabs = storage.read_tabs
+    flushed = threading.Event()
+
+    def slow_read_tabs(tab_names):
+        values = read_tabs(tab_names)
+        flushed.wait(5)
+        return values
+
+    sheet_helpers.update_person_sheet_status(
+        2, Status(status_name=StatusName.out, update_time=datetime.now())
+    )
+    sheet_helpers.sheet_cache.invalidate(PERSONS_SHEET_NAME)
+    monkeypatch.setattr(storage, "read_tabs", slow_read_tabs)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # loads the persons tab before the write, stores it after the flush
+        load = executor.submit(sheet_helpers.get_teams_and_persons)
+        time.sleep(0.05)
+        sheet_helpers.flush_persons_writes()
+        flushed.set()
+        _, loaded_persons = load.result()
+
+    assert loaded_persons["Alice"].status.status_name == StatusName.out
+    monkeypatch.setattr(storage, "read_tabs", read_tabs)
+    _, loaded_persons = sheet_helpers.get_teams_and_persons()
+    assert loaded_persons["Alice"].status.status_name == StatusName.out
+    assert sheet_helpers.persons_writes._written == []
+
+
+def test_switch_shifts_reads_and_writes_once(warm_spreadsheet):
+    with request_scope("switch") as request:
+        sheet_helpers.switch_shifts_sheet(
+            persons["Alice"], "3_2_2_3", persons["Dave"], "3_3_2"
+        )
+
+    assert request.sheet_calls == 2
+    assert warm_spreadsheet.calls == {"values_batch_get": 1, "values_batch_update": 1}
+    worksheet = warm_spreadsheet.worksheet(TASKS_SHEET_NAMES[0])
+    assert worksheet.get_values("C2:C3") == [["Dave"], ["Alice"]]
+
+
+def test_quota_errors_are_retried(spreadsheet):
+    spreadsheet.fail(2)
+    sheet_helpers.warm_up_sheet()
+    assert spreadsheet.calls == {"worksheets": 3, "values_batch_get": 1}
+    assert sheet_helpers.sheet_client.quota.stats() == {"throttled": 0, "retried": 2}
+
+
+def test_quota_errors_are_raised_after_retries(spreadsheet):
+    spreadsheet.fail(3, status_code=503)
+    with pytest.raises(APIError) as error:
+        sheet_helpers.warm_up_sheet()
+    assert error.value.response.status_code == 503
+
+
+def test_fake_worksheet_cells():
+    spreadsheet = FakeSpreadsheet({"tab": [["a", "b"], ["c"]]})
+    worksheet = spreadsheet.get_worksheet(0)
+    worksheet.update_cell(3, 2, 5)
+    worksheet.batch_update([{"range": "A1:B1", "values": [["x", ""]]}])
+
+    assert worksheet.get_all_values() == [["x", ""], ["c", ""], ["", "5"]]
+    assert worksheet.get_values("A1:B2") == [["x"], ["c"]]
+    assert worksheet.cell(3, 2).value == "5"
+    assert worksheet.cell(9, 9).value is None
+    assert spreadsheet.get_worksheet_by_id(worksheet.id) is worksheet
+
+
+def test_fake_worksheet_values_are_copies():
+    spreadsheet = FakeSpreadsheet({"tab": [["a", "b"], ["c", "d"]]})
+    worksheet = spreadsheet.get_worksheet(0)
+    all_values = worksheet.get_all_values()
+    range_values = worksheet.get_values()
+    worksheet.batch_update([{"range": "A1:B1", "values": [["x", "y"]]}])
+
+    assert all_values == range_values == [["a", "b"], ["c", "d"]]
+
+
+def test_concurrent_reloads_share_one_fetch(warm_spreadsheet):
+    sheet_helpers.sheet_cache.invalidate()
+    warm_spreadsheet.latency = 0.05
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda _: sheet_helpers.get_teams_and_persons(), range(8))
+        )
+
+    assert warm_spreadsheet.calls == {"values_batch_get": 1}
+    assert all(result == results[0] for result in results)
+
+
+def test_get_tab_by_index_finds_a_new_tab(warm_spreadsheet):
+    worksheet = warm_spreadsheet.add_worksheet("tasks new", [["date", "time"]])
+
+    tab = sheet_helpers.get_tab_by_index(worksheet.index)
+    assert (tab.title, tab.values) == ("tasks new", [["date", "time"]])
+    assert sheet_helpers.get_tab_index("tasks new") == worksheet.index
+    with pytest.raises(WorksheetNotFound):
+        sheet_helpers.get_tab_by_index(worksheet.index + 1)
+
+
+def test_reordered_tabs_get_their_new_index(warm_spreadsheet):
+    tasks = warm_spreadsheet.worksheet(TASKS_SHEET_NAMES[0])
+    others = [ws for ws in warm_spreadsheet.worksheets() if ws is not tasks]
+    warm_spreadsheet.reorder_worksheets([tasks, *others])
+    sheet_helpers.sheet_client.worksheets.clear()
+    sheet_helpers.sheet_cache.invalidate()
+
+    assert sheet_helpers.get_tab(TASKS_SHEET_NAMES[0]).index == 0
+    assert sheet_helpers.get_tab_by_index(0).title == TASKS_SHEET_NAMES[0]
+    assert (
+        sheet_helpers.get_tab(PERSONS_SHEET_NAME).index
+        == others.index(warm_spreadsheet.worksheet(PERSONS_SHEET_NAME)) + 1
+    )
@@ -0,0 +1,71 @@
+from on_call_bot.storage import SQLiteBackend, contiguous_ranges, sync_storage
+
+PERSONS_VALUES = [
+    ["name", "phone", "", "", "", "status"],
+    ["Alice", "050", "", "", "", ""],
+    [],
+    ["Bob", "051", "", "", "", "out"],
+]
+
+
+def make_sheet():
+    sheet = SQLiteBackend()
+    sheet.replace_tab("persons", 0, PERSONS_VALUES)
+    sheet.replace_tab("tasks", 1, [["date", "time", "Gate"]])
+    return sheet
+
+
+def test_sqlite_backend_read_write():
+    storage = make_sheet()
+    assert storage.tab_indexes() == {"persons": 0, "tasks": 1}
+    assert storage.read_tabs(["persons"])["persons"] == [
+        ["name", "phone", "", "", "", "status"],
+        ["Alice", "050", "", "", "", ""],
+        ["", "", "", "", "", ""],
+        ["Bob", "051", "", "", "", "out"],
+    ]
+
+    storage.write_cells([("persons", 2, 6, "here"), ("persons", 2, 8, 1234)])
+    assert storage.read_rows([("persons", 2)]) == [
+        ["Alice", "050", "", "", "", "here", "", "1234"]
+    ]
+    assert sorted(storage.dirty_cells()) == [
+        ("persons", 2, 6, "here"),
+        ("persons", 2, 8, "1234"),
+    ]
+
+
+def test_sync_storage_local_writes_win():
+    sheet = make_sheet()
+    local = SQLiteBackend()
+    assert sync_storage(local, sheet, ["persons", "tasks", "missing"]) == [
+        "persons",
+        "tasks",
+    ]
+    assert sync_storage(local, sheet, ["persons", "tasks"]) == []
+
+    local.write_cells([("persons", 4, 6, "here")])
+    sheet.write_cells([("persons", 4, 6, "released"), ("persons", 2, 2, "052")])
+    assert sync_storage(local, sheet, ["persons"]) == ["persons"]
+
+    expected_row = ["Bob", "051", "", "", "", "here"]
+    assert sheet.read_rows([("persons", 4)]) == [expected_row]
+    assert local.read_rows([("persons", 4), ("persons", 2)]) == [
+        expected_row,
+        ["Alice", "052"],
+    ]
+    assert local.dirty_cells() == []
+
+
+def test_contiguous_ranges():
+    updates = [
+        ("persons", 5, 7, "b"),
+        ("persons", 5, 6, "a"),
+        ("persons", 5, 9, "c"),
+        ("tasks", 2, 3, "d"),
+    ]
+    assert contiguous_ranges(updates) == [
+        (("persons", 5), 6, ["a", "b"]),
+        (("persons", 5), 9, ["c"]),
+        (("tasks", 2), 3, ["d"]),
+    ]
@@ -2,7 +2,12 @@ from datetime import datetime
 
 import pytest
 
-from on_call_bot.utils import extract_and_convert_to_datetime_range
+from on_call_bot.utils import (
+    convert_date_time_columns,
+    extract_and_convert_to_datetime,
+    extract_and_convert_to_datetime_range,
+    inherit_blank_dates,
+)
 
 
 @pytest.mark.parametrize(
@@ -33,3 +38,38 @@ def test_extract_and_convert_to_datetime_range(datetime_range_value, expected_re
     assert (
         extract_and_convert_to_datetime_range(datetime_range_value) == expected_result
     )
+
+
+@pytest.mark.parametrize(
+    "date_value, time_value, expected_result",
+    [
+        (
+            "10.3.24",
+            "07:00-15:00",
+            (datetime(2024, 3, 10, 7), datetime(2024, 3, 10, 15)),
+        ),
+        (
+            "10.3.24",
+            "23:00-07:00",
+            (datetime(2024, 3, 10, 23), datetime(2024, 3, 11, 7)),
+        ),
+        ("10/3/2024", "", (datetime(2024, 3, 10), datetime(2024, 3, 10, 23, 59))),
+        ("32.3.24", "07:00-15:00", (None, None)),
+    ],
+)
+def test_extract_and_convert_to_datetime(date_value, time_value, expected_result):
+    assert extract_and_convert_to_datetime(date_value, time_value) == expected_result
+    # second call is served from the memo table
+    assert extract_and_convert_to_datetime(date_value, time_value) == expected_result
+
+
+def test_convert_date_time_columns_inherits_blank_dates():
+    dates = ["10.3.24", "", "11.3.24", ""]
+    times = ["07:00-19:00", "19:00-07:00", "07:00-19:00", ""]
+    assert inherit_blank_dates(dates) == ["10.3.24", "10.3.24", "11.3.24", "11.3.24"]
+    assert convert_date_time_columns(dates, times) == [
+        (datetime(2024, 3, 10, 7), datetime(2024, 3, 10, 19)),
+        (datetime(2024, 3, 10, 19), datetime(2024, 3, 11, 7)),
+        (datetime(2024, 3, 11, 7), datetime(2024, 3, 11, 19)),
+        (datetime(2024, 3, 11), datetime(2024, 3, 11, 23, 59)),
+    ]
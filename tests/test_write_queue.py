@@ -0,0 +1,81 @@
+import pytest
+
+from on_call_bot.write_queue import WriteBehindQueue
+
+
+class RecordingStorage:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+
+    def write_cells(self, updates):
+        if self.fail:
+            raise ConnectionError("sheet is down")
+        self.batches.append(sorted(updates))
+
+
+def test_write_queue_merges_rows(tmp_path):
+    queue = WriteBehindQueue("persons", str(tmp_path / "writes.journal"))
+    queue.put(5, 6, "out")
+    queue.put(5, 7, "2024-03-10T07:00:00")
+    queue.put(5, 6, "here")
+    queue.put(3, 8, 1234)
+    storage = RecordingStorage()
+
+    assert queue.flush(storage) == 2
+    assert storage.batches == [
+        [
+            ("persons", 3, 8, "1234"),
+            ("persons", 5, 6, "here"),
+            ("persons", 5, 7, "2024-03-10T07:00:00"),
+        ]
+    ]
+    assert queue.flush(storage) == 0
+    assert len(storage.batches) == 1
+
+
+def test_write_queue_overlay():
+    queue = WriteBehindQueue("persons")
+    queue.put(2, 3, "c")
+    values = [["name", "phone"], ["a", "b"]]
+    assert queue.overlay(values) == [["name", "phone"], ["a", "b", "c"]]
+    assert values == [["name", "phone"], ["a", "b"]]
+
+
+def test_write_queue_survives_restart_and_failures(tmp_path):
+    journal_path = str(tmp_path / "writes.journal")
+    queue = WriteBehindQueue("persons", journal_path)
+    queue.put(4, 6, "out")
+    with pytest.raises(ConnectionError):
+        queue.flush(RecordingStorage(fail=True))
+    assert len(queue) == 1
+
+    restarted_queue = WriteBehindQueue("persons", journal_path)
+    storage = RecordingStorage()
+    assert restarted_queue.flush(storage) == 1
+    assert storage.batches == [[("persons", 4, 6, "out")]]
+    assert len(WriteBehindQueue("persons", journal_path)) == 0
+
+
+def test_write_queue_overlay_during_flush():
+    queue = WriteBehindQueue("persons")
+    queue.put(2, 3, "out")
+    values = [["name", "phone", "status"], ["a", "b", "here"]]
+    seen = []
+
+    class SlowStorage(RecordingStorage):
+        def write_cells(self, updates):
+            seen.append(queue.overlay(values))
+            queue.put(2, 2, "c")
+            super().write_cells(updates)
+
+    def on_flushed():
+        seen.append(queue.overlay(values))
+        return 7
+
+    queue.flush(SlowStorage(), on_flushed=on_flushed)
+    assert seen == [[values[0], ["a", "b", "out"]], [values[0], ["a", "c", "out"]]]
+    # snapshots loaded before the flushed write still get it from the overlay
+    assert queue.overlay(values, generation=6) == [values[0], ["a", "c", "out"]]
+    assert queue.overlay(values, generation=7) == [values[0], ["a", "c", "here"]]
+    assert queue.overlay(values, generation=6) == [values[0], ["a", "c", "here"]]